@@ -0,0 +1,117 @@
+import argparse
+import csv
+import json
+import random
+from multiprocessing import Pool, cpu_count
+from time import perf_counter
+
+from factorize import factorize, find_numbs_naive, multi_facrorize, batch_find_numbs, np, SIEVE_LIMIT
+
+MAGNITUDES = {
+    "small": (1, 10**4),
+    "large": (10**9, 10**12),
+    "mixed": None,
+}
+NAIVE_LIMIT = 10**6  # find_numbs_naive is O(n), it is only used below this bound
+NAIVE_MAX_WORK = 10**8
+
+
+def make_numbers(magnitude, count, seed=0):
+    rnd = random.Random(seed)
+    if magnitude == "mixed":
+        bounds = [b for b in MAGNITUDES.values() if b]
+        return [rnd.randint(*rnd.choice(bounds)) for _ in range(count)]
+    return [rnd.randint(*MAGNITUDES[magnitude]) for _ in range(count)]
+
+
+def naive_sample(numbers, seed=0): #naive results for a random sample of inputs whose total O(n) work stays under NAIVE_MAX_WORK
+    candidates = [i for i, n in enumerate(numbers) if n <= NAIVE_LIMIT]
+    random.Random(seed).shuffle(candidates)
+    sample, work = {}, 0
+    for i in candidates:
+        work += max(numbers[i], 1)
+        if work > NAIVE_MAX_WORK:
+            break
+        sample[i] = find_numbs_naive(numbers[i])
+    return sample
+
+
+def reference(numbers): #sync engine output plus an independent naive check on a bounded sample
+    return factorize(*numbers), naive_sample(numbers)
+
+
+def is_correct(result, expected):
+    # every strategy has to agree with the sync engine and, on the sample, with the naive loop;
+    # the second part is what makes the sync row itself meaningful
+    return result == expected[0] and all(result[i] == divs for i, divs in expected[1].items())
+
+
+def strategies(numbers, workers, pools):
+    biggest = max(numbers)
+    if biggest * len(numbers) <= NAIVE_MAX_WORK and biggest <= NAIVE_LIMIT:
+        yield "naive", 1, lambda: [find_numbs_naive(n) for n in numbers]
+    yield "sync", 1, lambda: factorize(*numbers)
+    for w in workers:
+        yield "multiprocess", w, lambda w=w: multi_facrorize(*numbers, pool=pools[w], workers=w)
+    if np is not None and biggest <= SIEVE_LIMIT:
+        yield "sieve", 1, lambda: batch_find_numbs(numbers)
+
+
+def run(magnitudes, counts, workers, repeat):
+    pools = {w: Pool(w) for w in workers}
+    rows = []
+    try:
+        for magnitude in magnitudes:
+            for count in counts:
+                numbers = make_numbers(magnitude, count)
+                expected = reference(numbers)
+                for name, w, func in strategies(numbers, workers, pools):
+                    timings = []
+                    for _ in range(repeat):
+                        start = perf_counter()
+                        result = func()
+                        timings.append(perf_counter() - start)
+                    rows.append({
+                        "magnitude": magnitude,
+                        "count": count,
+                        "strategy": name,
+                        "workers": w,
+                        "best_s": round(min(timings), 6),
+                        "mean_s": round(sum(timings) / len(timings), 6),
+                        "numbers_per_s": round(count / min(timings), 1) if min(timings) else None,
+                        "checked": len(expected[1]),
+                        "correct": is_correct(result, expected),
+                    })
+                    print("| {magnitude:<6} | {count:>8} | {strategy:<12} | {workers:>3} | {best_s:>10.4f} | {correct} |".format(**rows[-1]))
+    finally:
+        for pool in pools.values():
+            pool.close()
+            pool.join()
+    return rows
+
+
+def save(rows, path):
+    if path.endswith(".json"):
+        with open(path, "w", encoding="utf-8") as fd:
+            json.dump(rows, fd, indent=4)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as fd:
+            writer = csv.DictWriter(fd, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare factorize strategies")
+    parser.add_argument("--magnitudes", nargs="+", default=list(MAGNITUDES), choices=list(MAGNITUDES))
+    parser.add_argument("--counts", nargs="+", type=int, default=[10, 1000, 100000], help="e.g. 10 1000 1000000")
+    parser.add_argument("--workers", nargs="+", type=int, default=sorted({1, cpu_count()}))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="factorize_benchmark.csv", help="results file, .csv or .json")
+    args = parser.parse_args()
+
+    rows = run(args.magnitudes, args.counts, args.workers, args.repeat)
+    save(rows, args.out)
+    if not all(row["correct"] for row in rows):
+        raise SystemExit("Some strategies returned wrong results")
+    print(f"Results saved to {args.out}")
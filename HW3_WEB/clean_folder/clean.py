@@ -4,28 +4,64 @@ from datetime import datetime
 import shutil
 from pathlib import Path
 import logging
-from threading import Thread, RLock
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import sys
+from threading import Thread, RLock, Lock
 
 logger_format = ("%(asctime)s [%(levelname)s] - %(name)s - %(funcName)15s:%(lineno)d - %(message)s")
 lock = RLock()
+threads = []
 
-fh = logging.FileHandler("clean_folder.log")
-fh.setLevel(logging.DEBUG)     
-fh.setFormatter(logging.Formatter(logger_format))
+# verbosity modes: "summary" - only the final summary, "sample" - every N-th per-file line, "full" - every line
+VERBOSITY = "summary"
+SAMPLE_EVERY = 100
 
-sh = logging.StreamHandler()
-sh.setLevel(logging.ERROR)   
-sh.setFormatter(logging.Formatter(logger_format))
+log_queue = queue.SimpleQueue()
+listener = None
+stats = collections.Counter()
+stats_lock = Lock()
+
+def setup_logging(verbosity=VERBOSITY, sample_every=SAMPLE_EVERY): #configure handlers only once, the file is written by the listener thread
+    global listener, VERBOSITY, SAMPLE_EVERY
+    VERBOSITY, SAMPLE_EVERY = verbosity, max(1, sample_every)
+    if listener is not None:
+        return
+    fh = logging.FileHandler("clean_folder.log")
+    fh.setLevel(logging.DEBUG)
+    fh.setFormatter(logging.Formatter(logger_format))
+
+    sh = logging.StreamHandler()
+    sh.setLevel(logging.ERROR)
+    sh.setFormatter(logging.Formatter(logger_format))
+
+    listener = QueueListener(log_queue, fh, sh, respect_handler_level=True)
+    listener.start()
+
+def stop_logging(): #write the summary and wait until the listener drains the queue
+    global listener
+    if listener is None:
+        return
+    logger.info("Summary: " + ", ".join(f"{k}={v}" for k, v in sorted(stats.items())))
+    listener.stop()
+    listener = None
 
 def get_logger(name):
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
-    logger.addHandler(sh)
-    logger.addHandler(fh)
+    if not any(isinstance(h, QueueHandler) for h in logger.handlers):
+        logger.addHandler(QueueHandler(log_queue))
     return logger
 
 logger = get_logger(__name__)
 
+def log_event(event, msg, *args): #count the event and decide if a per-file line is needed
+    with stats_lock:
+        stats[event] += 1
+        count = stats[event]
+    if VERBOSITY == "full" or (VERBOSITY == "sample" and (count - 1) % SAMPLE_EVERY == 0):
+        logger.info(msg, *args, stacklevel=2)
+
 CYRILLIC_SYMBOLS = "абвгдеёжзийклмнопрстуфхцчшщъыьэюяєіїґ?<>,!@#[]№$%^&*()-=; "
 LATIN_SYMBOLS = ("a", "b", "v", "g", "d", "e", "e", "j", "z", "i", "j", "k", "l", "m", "n", "o", "p", "r", "s", "t", "u",
                "f", "h", "ts", "ch", "sh", "sch", "", "y", "", "e", "yu", "ya", "je", "i", "ji", "g", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_", "_","_", "_")
@@ -47,24 +83,24 @@ def file_ex(file, path): #the function checks if a file with this name already e
         name = datetime.now().strftime("%d_%m_%Y_%H_%M_%S_%f")
         new_name = file.resolve().stem + f"_{name}_" + file.suffix
         new_path = Path(path, new_name)
-        logger.info(f"File with name '{file.resolve().stem}' is already exists and was renamed to {new_name}")
+        log_event("renamed", "File with name '%s' is already exists and was renamed to %s", file.stem, new_name)
         return new_path
     return file
 
 def fold_create(file, path): #check if the necessary folder exists, if not - create it
-    if path.exists():
-        Thread(target=folder_sort, args=(lock, file, path)).start()
-    else:
+    if not path.exists():
         Path(path).mkdir()
-        logger.info(f"Folder with name '{path}' was not exist and was created")
-        Thread(target=folder_sort, args=(lock, file, path)).start()
+        log_event("folders_created", "Folder with name '%s' was not exist and was created", path)
+    thread = Thread(target=folder_sort, args=(lock, file, path))
+    thread.start()
+    threads.append(thread)
 
 def folder_sort(locker, file, path): #changes the name of the file and moves it to the required folder.
     latin_name = normalize(file.name)
     new_file = Path(path, latin_name)
     file_path = file_ex(new_file, path)
     file.replace(file_path)
-    logger.info(f"File with name '{file.name}' was removed to {path}")  
+    log_event("moved", "File with name '%s' was removed to %s", file.name, path)
 
 def show_result(p):
     total_dict = collections.defaultdict(list) 
@@ -108,7 +144,7 @@ def file_sort(folder ,p): #Checks each folder and file by their extension, organ
                 file_sort(folder, i)  
             else:
                 shutil.rmtree(i)  
-                logger.info(f"Empty folder '{i}' was removed") 
+                log_event("folders_removed", "Empty folder '%s' was removed", i)
     for fold in p.iterdir():
         if fold.name == "archives" and len(list(fold.iterdir())) != 0:
             for arch in fold.iterdir():
@@ -117,34 +153,43 @@ def file_sort(folder ,p): #Checks each folder and file by their extension, organ
                         arch_name = arch.resolve().stem  
                         path_to_unpack = Path(p, "archives", arch_name)  
                         shutil.unpack_archive(arch, path_to_unpack)
-                        logger.info(f"Archiv '{arch.name}' was unpacked")
+                        log_event("unpacked", "Archiv '%s' was unpacked", arch.name)
                     except:
-                        logger.error(f"Error unpacking the archive '{arch.name}'!")
+                        with stats_lock:
+                            stats["errors"] += 1
+                        logger.error("Error unpacking the archive '%s'!", arch.name)
                     finally:
                         continue
                 else:
                     continue
         elif fold.is_dir() and not len(list(fold.iterdir())):
             shutil.rmtree(fold)
-            logger.info(f"Empty folder '{fold}' was removed")  
+            log_event("folders_removed", "Empty folder '%s' was removed", fold)
 
 def normalize(name): #replace Cyrillic characters with Latin 
     global TRANS
-    logger.info(f"File name '{name}' was normalized")
+    log_event("normalized", "File name '%s' was normalized", name)
     return name.translate(TRANS)
 
 def main():
-    logger = get_logger(__name__)
+    # python clean.py [summary|sample|full] [N]
+    verbosity = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] in ("summary", "sample", "full") else VERBOSITY
+    sample_every = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else SAMPLE_EVERY
+    setup_logging(verbosity, sample_every)
     path = input('Enter the path to the folder\n>>>') 
     p = Path(path)
     folder = Path(path)
     try:
         file_sort(folder, p)
+        for thread in threads:
+            thread.join()
     except FileNotFoundError:
         print("The folder was not found.\n")
-        logger.error(f"The folder with path '{path}' was not found")
+        logger.error("The folder with path '%s' was not found", path)
     else:
         return show_result(p)
+    finally:
+        stop_logging()
 
 if __name__ == "__main__":
     main()
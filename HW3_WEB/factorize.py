@@ -1,7 +1,111 @@
 from time import time
+from math import gcd, isqrt
 from multiprocessing import Pool, cpu_count
+import atexit
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRIME_LIMIT = 1 << 16
+PRIMES = []
+
+def get_primes(): #sieve of Eratosthenes, the table is built once per process
+    if not PRIMES:
+        sieve = bytearray([1]) * (PRIME_LIMIT + 1)
+        sieve[0:2] = b"\x00\x00"
+        for i in range(2, isqrt(PRIME_LIMIT) + 1):
+            if sieve[i]:
+                sieve[i*i::i] = bytes(len(range(i*i, PRIME_LIMIT + 1, i)))
+        PRIMES.extend(i for i, is_prime in enumerate(sieve) if is_prime)
+    return PRIMES
+
+def is_prime(n): #deterministic Miller-Rabin for n < 3.3 * 10**24
+    if n < 2:
+        return False
+    for p in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41):
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41):
+        x = pow(a, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+def pollard_rho(n): #returns a non-trivial divisor of the composite n (Brent's variant)
+    if n % 2 == 0:
+        return 2
+    while True:
+        y, c, m = random.randrange(1, n), random.randrange(1, n), 128
+        g, r, q = 1, 1, 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+def prime_factors(number): #returns {prime: power}
+    factors = {}
+    n = number
+    for p in get_primes():
+        if p * p > n:
+            break
+        while n % p == 0:
+            factors[p] = factors.get(p, 0) + 1
+            n //= p
+    if n == 1:
+        return factors
+    stack = [n]
+    while stack:
+        n = stack.pop()
+        if n < PRIME_LIMIT * PRIME_LIMIT or is_prime(n):
+            factors[n] = factors.get(n, 0) + 1
+        else:
+            d = pollard_rho(n)
+            stack.extend((d, n // d))
+    return factors
+
+def divisors(factors): #all divisors from the prime powers, sorted
+    result = [1]
+    for p, k in factors.items():
+        powers = [p**e for e in range(k + 1)]
+        result = [d * power for d in result for power in powers]
+    result.sort()
+    return result
 
 def find_numbs(number):
+    if number < 1:
+        return []
+    return divisors(prime_factors(number))
+
+def find_numbs_naive(number): #reference implementation, O(n)
     res_list = []
     for i in range(1, number+1):
         if number % i == 0:
@@ -14,10 +118,121 @@ def factorize(*numbers):
         result.append(find_numbs(number))
     return result
 
-def multi_facrorize(*numbers):
-    with Pool(cpu_count()) as p:
-        result = p.map(find_numbs, numbers)
-    return result
+def estimate_cost(number): #trial division is bounded by the prime table, bigger numbers also pay for Pollard's rho
+    return min(isqrt(max(number, 0)), PRIME_LIMIT) + number.bit_length() ** 3
+
+def make_chunks(numbers, workers, chunks_per_worker=4): #split (index, number) pairs into chunks of similar estimated cost
+    tasks = sorted(enumerate(numbers), key=lambda item: estimate_cost(item[1]), reverse=True)
+    total = sum(estimate_cost(n) for _, n in tasks)
+    target = max(1, total // (workers * chunks_per_worker))
+    chunks, chunk, chunk_cost = [], [], 0
+    for index, number in tasks:
+        chunk.append((index, number))
+        chunk_cost += estimate_cost(number)
+        if chunk_cost >= target:
+            chunks.append(chunk)
+            chunk, chunk_cost = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+def find_chunk(chunk):
+    return [(index, find_numbs(number)) for index, number in chunk]
+
+_pool = None
+_pool_size = 0
+
+def get_pool(processes=None): #long-lived pool, reused between calls
+    global _pool, _pool_size
+    if _pool is None:
+        _pool_size = processes or cpu_count()
+        _pool = Pool(_pool_size)
+    return _pool
+
+@atexit.register
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool.join()
+        _pool = None
+
+def iter_multi_factorize(*numbers, pool=None, ordered=False, workers=None): #yields (index, divisors) as soon as a chunk is ready
+    if pool is None:
+        pool = get_pool()
+        workers = workers or _pool_size
+    chunks = make_chunks(numbers, workers or cpu_count())  #workers: size of a pool passed in, used to size the chunks
+    pending = {}
+    next_index = 0
+    for chunk_result in pool.imap_unordered(find_chunk, chunks):
+        if not ordered:
+            yield from chunk_result
+            continue
+        pending.update(chunk_result)
+        while next_index in pending:
+            yield next_index, pending.pop(next_index)
+            next_index += 1
+
+def multi_facrorize(*numbers, pool=None, workers=None):
+    return [divs for _, divs in iter_multi_factorize(*numbers, pool=pool, ordered=True, workers=workers)]
+
+SPF_SIEVE = None
+SIEVE_LIMIT = 10**8  # the sieve takes limit bytes; uint16 entries would also overflow above 2**32
+
+def get_spf_sieve(limit): #smallest prime factor of every odd number up to limit, 0 means the number is prime
+    global SPF_SIEVE
+    if np is None:
+        raise ImportError("numpy is required for batch_find_numbs")
+    if limit > SIEVE_LIMIT:
+        raise ValueError(f"batch_find_numbs handles numbers up to {SIEVE_LIMIT}, got {limit}; use factorize for bigger ones")
+    if SPF_SIEVE is not None and 2 * len(SPF_SIEVE) - 1 >= limit:
+        return SPF_SIEVE
+    # index i stands for the odd number 2*i + 1; every composite below 10**8 has a factor < 2**16, so uint16 is enough
+    sieve = np.zeros(limit // 2 + 1, dtype=np.uint16)
+    for p in range(3, isqrt(limit) + 1, 2):
+        if sieve[p // 2] == 0:
+            view = sieve[p * p // 2::p]
+            view[view == 0] = p
+    SPF_SIEVE = sieve
+    return sieve
+
+def iter_batch_find_numbs(numbers, chunk_size=1 << 16): #yields divisor lists in input order, one chunk of inputs at a time
+    numbers = list(numbers)
+    if not numbers:
+        return
+    sieve = get_spf_sieve(max(max(numbers), 1))
+    for start in range(0, len(numbers), chunk_size):
+        arr = np.array(numbers[start:start + chunk_size], dtype=np.int64)
+        valid = arr >= 1
+        rest = np.where(valid, arr, 1)
+        owners, primes = [], []
+        while True:
+            idx = np.nonzero(rest % 2 == 0)[0]
+            if not len(idx):
+                break
+            owners.append(idx)
+            primes.append(np.full(len(idx), 2, dtype=np.int64))
+            rest[idx] //= 2
+        while True:
+            idx = np.nonzero(rest > 1)[0]
+            if not len(idx):
+                break
+            values = rest[idx]
+            p = sieve[values // 2].astype(np.int64)
+            p = np.where(p == 0, values, p)
+            owners.append(idx)
+            primes.append(p)
+            rest[idx] = values // p
+        factors = [{} for _ in range(len(arr))]
+        if owners:
+            owners, primes = np.concatenate(owners), np.concatenate(primes)
+            for owner, p in zip(owners.tolist(), primes.tolist()):
+                factors[owner][p] = factors[owner].get(p, 0) + 1
+        for ok, number_factors in zip(valid.tolist(), factors):
+            yield divisors(number_factors) if ok else []
+
+def batch_find_numbs(numbers, chunk_size=1 << 16):
+    return list(iter_batch_find_numbs(numbers, chunk_size))
 
 if __name__ == '__main__':
     start = time()
@@ -0,0 +1,91 @@
+import argparse
+import http.client
+import os
+import socket
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer
+from threading import Thread
+from time import perf_counter
+
+from main import HttpHandler, HttpServer
+
+PATHS = ['/', '/message', '/style.css', '/logo.png', '/missing']
+
+
+class LegacyHandler(HttpHandler):
+    protocol_version = 'HTTP/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietHandler(HttpHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(server_class, handler_class):
+    http = server_class(('127.0.0.1', 0), handler_class)
+    Thread(target=http.serve_forever, daemon=True).start()
+    return http
+
+
+def client(port, requests, timeout):
+    # a client gives up after its first failed request, the rest of its requests count as errors
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    latencies = []
+    try:
+        for i in range(requests):
+            start = perf_counter()
+            conn.request('GET', PATHS[i % len(PATHS)])
+            conn.getresponse().read()
+            latencies.append(perf_counter() - start)
+    except OSError:
+        pass
+    finally:
+        conn.close()
+    return latencies
+
+
+def run(name, server_class, handler_class, clients, requests, slow_clients, timeout=5):
+    http = start_server(server_class, handler_class)
+    port = http.server_address[1]
+    # slow clients connect and send half a request line, then stall
+    stalled = []
+    for _ in range(slow_clients):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(b'GET / HT')
+        stalled.append(sock)
+    start = perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        futures = [pool.submit(client, port, requests, timeout) for _ in range(clients)]
+        latencies = [t for f in futures for t in f.result()]
+    elapsed = perf_counter() - start
+    for sock in stalled:
+        sock.close()
+    http.shutdown()
+    http.server_close()
+    errors = clients * requests - len(latencies)
+    if len(latencies) < 2:
+        print(f"{name:<28} clients={clients:<4} slow={slow_clients} all requests failed")
+        return
+    q = statistics.quantiles(latencies, n=100)
+    print(f"{name:<28} clients={clients:<4} slow={slow_clients} rps={len(latencies) / elapsed:8.0f} "
+          f"errors={errors:<5} p50={q[49] * 1000:6.1f}ms p99={q[98] * 1000:6.1f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrency benchmark for the HTTP front end')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=50, help='requests per client')
+    parser.add_argument('--slow-clients', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=5, help='client socket timeout, seconds')
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    run('threaded HTTP/1.1', HttpServer, QuietHandler, args.clients, args.requests, 0, args.timeout)
+    run('threaded HTTP/1.1 + slow', HttpServer, QuietHandler, args.clients, args.requests, args.slow_clients, args.timeout)
+    run('single HTTP/1.0', HTTPServer, LegacyHandler, args.clients, args.requests, 0, args.timeout)
+    run('single HTTP/1.0 + slow', HTTPServer, LegacyHandler, args.clients, args.requests, args.slow_clients, args.timeout)
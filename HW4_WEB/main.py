@@ -1,28 +1,150 @@
 from datetime import datetime
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from threading import Thread
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Condition, Lock, Thread
+from time import sleep
 import json
 import logging
-import mimetypes
+import os
 import pathlib
+import queue
 import socket
+import socketserver
+import struct
 import urllib.parse
 
+from message_store import MessageIndex, MessageStore
+from static_files import StaticFiles, send_file
+
 BASE_DIR = pathlib.Path()
+static_files = StaticFiles(BASE_DIR)
+store = None
+index = None
+client = None
+globals_lock = Lock()  # the getters below are called from the HTTP threads and the storage writer
+
+TRANSPORT = os.environ.get('STORAGE_TRANSPORT', 'tcp')  # 'tcp', 'unix' or the old single datagram 'udp'
+SOCKET_ADDRESS = ('127.0.0.1', 5000)
+UNIX_SOCKET = 'storage/storage.sock'
+# a connection starts with the 16-byte client id, then every message is sent as its sequence number,
+# a 4-byte length and the payload; a header with the END_OF_BATCH length asks for an acknowledgement,
+# answered with the highest sequence number of that client that has been written to storage
+CLIENT_ID_SIZE = 16
+FRAME_HEADER = struct.Struct('!QI')
+ACK = struct.Struct('!Q')
+END_OF_BATCH = 0xFFFFFFFF
+MAX_FRAME = 16 * 1024 * 1024
+
+
+class FramedClient(Thread):
+    # one persistent connection to the storage server shared by all http threads;
+    # messages are queued and written together, a batch is kept until the server acknowledges it
+
+    def __init__(self, family, address, max_batch=100, timeout=30, max_backoff=5):
+        super().__init__(name='FramedClient', daemon=True)
+        self.family = family
+        self.address = address
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.client_id = os.urandom(CLIENT_ID_SIZE)
+        self.seq = 0
+        self.queue = queue.Queue()
+        self.sock = None
+
+    def send(self, data):
+        if len(data) > MAX_FRAME:
+            raise ValueError(f'Message of {len(data)} bytes is larger than {MAX_FRAME}')
+        self.queue.put(data)
+
+    def connect(self):
+        self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.address)
+        self.sock.sendall(self.client_id)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def recv_ack(self):
+        data = b''
+        while len(data) < ACK.size:
+            chunk = self.sock.recv(ACK.size - len(data))
+            if not chunk:
+                raise ConnectionError('Storage server closed the connection')
+            data += chunk
+        return ACK.unpack(data)[0]
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            first = self.seq + 1
+            self.seq += len(batch)
+            payload = b''.join(FRAME_HEADER.pack(seq, len(data)) + data for seq, data in enumerate(batch, first))
+            payload += FRAME_HEADER.pack(self.seq, END_OF_BATCH)
+            attempt = 0
+            while True:
+                # a batch is sent again until it is acknowledged, the server skips frames it already has
+                try:
+                    if self.sock is None:
+                        self.connect()
+                    self.sock.sendall(payload)
+                    if self.recv_ack() >= self.seq:
+                        break
+                    raise ConnectionError('Storage server acknowledged an incomplete batch')
+                except OSError as err:
+                    self.close()
+                    attempt += 1
+                    logging.error(f'Storage connection error {err}, {len(batch)} messages kept, attempt {attempt}')
+                    sleep(min(0.1 * 2 ** attempt, self.max_backoff))
+
+
+def get_client():
+    global client
+    with globals_lock:
+        if client is None:
+            if TRANSPORT == 'unix':
+                client = FramedClient(socket.AF_UNIX, str(BASE_DIR.joinpath(UNIX_SOCKET)))
+            else:
+                client = FramedClient(socket.AF_INET, SOCKET_ADDRESS)
+            client.start()
+        return client
 
 def send_to_socket(data):
+    if TRANSPORT != 'udp':
+        get_client().send(data)
+        return
     cli_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    cli_socket.sendto(data, ('127.0.0.1', 5000))
+    cli_socket.sendto(data, SOCKET_ADDRESS)
     cli_socket.close()
 
 
 class HttpHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive, every response has to send Content-Length
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body are written separately
 
     def do_POST(self):
-        data = self.rfile.read(int(self.headers['Content-Length']))
+        size = int(self.headers['Content-Length'])
+        if size > MAX_FRAME:
+            # the body is not read, so the connection cannot be reused
+            self.close_connection = True
+            self.send_response(413)
+            self.send_header('Content-Length', '0')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            return
+        data = self.rfile.read(size)
         send_to_socket(data)
         self.send_response(302)
         self.send_header('Location', '/')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
     def do_GET(self):
@@ -31,33 +153,42 @@ class HttpHandler(BaseHTTPRequestHandler):
             self.send_html_file('index.html')
         elif parse_url.path == '/message':
             self.send_html_file('message.html')
+        elif parse_url.path == '/messages':
+            self.send_messages(urllib.parse.parse_qs(parse_url.query))
         else:
-            if pathlib.Path().joinpath(parse_url.path[1:]).exists():
-                self.send_static()
+            entry = static_files.get(urllib.parse.unquote(parse_url.path[1:]))
+            if entry is not None:
+                send_file(self, entry)
             else:
                 self.send_html_file('error.html', 404)
 
     def send_html_file(self, filename, status=200):
-        self.send_response(status)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        with open(filename, 'rb') as fd:
-            self.wfile.write(fd.read())
+        send_file(self, static_files.get(filename), status)
 
-    def send_static(self):
+    def send_messages(self, params):
+        # /messages?from=2023-04-23&to=2023-04-24&username=Yana&limit=20&cursor=<next_cursor>
+        params = {key: values[-1] for key, values in params.items()}
+        try:
+            limit = min(max(int(params.pop('limit', 50)), 1), 500)
+        except ValueError:
+            limit = 50
+        messages, next_cursor = get_index().query(
+            params.pop('from', None), params.pop('to', None),
+            cursor=params.pop('cursor', None), limit=limit, filters=params)
+        body = json.dumps({'messages': messages, 'next_cursor': next_cursor}, ensure_ascii=False).encode()
         self.send_response(200)
-        mt = mimetypes.guess_type(self.path)
-        if mt:
-            self.send_header("Content-type", mt[0])
-        else:
-            self.send_header("Content-type", 'text/plain')
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        with open(f'.{self.path}', 'rb') as file:
-            self.wfile.write(file.read())
+        self.wfile.write(body)
+
 
+class HttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
 
-def run_http_server(server_class=HTTPServer, handler_class=HttpHandler):
-    server_address = ('0.0.0.0', 3000)
+
+def run_http_server(server_class=HttpServer, handler_class=HttpHandler, server_address=('0.0.0.0', 3000)):
     http = server_class(server_address, handler_class)
     logging.info('Http server started')
     try:
@@ -65,38 +196,196 @@ def run_http_server(server_class=HTTPServer, handler_class=HttpHandler):
     except KeyboardInterrupt:
         http.server_close()
 
-def run_socket_server(ip, port):
+class StorageWriter(Thread):
+    # drains the queue filled by the socket server and saves every batch with one write and fsync
+
+    def __init__(self, max_queue=100000, max_batch=1000):
+        super().__init__(name='StorageWriter', daemon=True)
+        self.queue = queue.Queue(max_queue)
+        self.max_batch = max_batch
+        self.lock = Lock()
+        self.saved = Condition()
+        self.received = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+
+    def put(self, data, block=False):
+        # datagrams are dropped when the queue is full, stream connections wait instead;
+        # returns the position of data in the queue for wait_written, None when it was dropped
+        with self.lock:
+            try:
+                self.queue.put((str(datetime.now()), data), block=block)
+                self.received += 1
+                return self.received
+            except queue.Full:
+                self.dropped += 1
+
+    def wait_written(self, ticket, timeout=None):
+        with self.saved:
+            return self.saved.wait_for(lambda: self.written >= ticket, timeout)
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            save_batch([item for item in batch if item is not None])
+            with self.saved:
+                self.written += len(batch) - stop
+                self.batches += 1
+                self.saved.notify_all()
+            if stop:
+                return
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+    def stats(self):
+        return {'queue_depth': self.queue.qsize(), 'received': self.received, 'dropped': self.dropped,
+                'written': self.written, 'batches': self.batches}
+
+
+def run_socket_server(ip, port, writer=None, stats_interval=10):
+    writer = writer or StorageWriter()
+    if not writer.is_alive():
+        writer.start()
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
     server = ip, port
     server_socket.bind(server)
+    server_socket.settimeout(stats_interval)
     logging.info('Socket server started')
+    last_stats = None
     try:
         while True:
-            data, address = server_socket.recvfrom(1024)
-            save_data(data)
+            try:
+                data, address = server_socket.recvfrom(1024)
+            except socket.timeout:
+                data = None
+            if data is not None:
+                writer.put(data)
+            stats = writer.stats()
+            if stats != last_stats and (data is None or stats['received'] % 10000 == 0):
+                logging.info(f'Storage writer {stats}')
+                last_stats = stats
     except KeyboardInterrupt:
         logging.info('Destroy server')
     finally:
         server_socket.close()
+        writer.stop()
+        logging.info(f'Storage writer {writer.stats()}')
 
-def save_data(data):
-    data_parse = urllib.parse.unquote_plus(data.decode())
+class FrameHandler(socketserver.StreamRequestHandler):
+    timeout = 300  # a connection the client has given up on does not keep its thread forever
+
+    def read_exactly(self, size):
+        data = self.rfile.read(size)
+        return data if len(data) == size else None
+
+    def handle(self):
+        client_id = self.read_exactly(CLIENT_ID_SIZE)
+        if client_id is None:
+            return
+        clients = self.server.clients
+        while True:
+            header = self.read_exactly(FRAME_HEADER.size)
+            if header is None:
+                return
+            seq, size = FRAME_HEADER.unpack(header)
+            if size == END_OF_BATCH:
+                with self.server.lock:
+                    last_seq, ticket = clients.get(client_id, (0, 0))
+                if not self.server.writer.wait_written(ticket, self.timeout):
+                    return
+                self.wfile.write(ACK.pack(last_seq))
+                continue
+            if size > MAX_FRAME:
+                logging.error(f'Frame of {size} bytes from {self.client_address} is too big')
+                return
+            data = self.read_exactly(size)
+            if data is None:
+                return
+            with self.server.lock:
+                # a resent frame was already stored through an earlier connection of the same client
+                if seq <= clients.get(client_id, (0, 0))[0]:
+                    continue
+                clients[client_id] = (seq, self.server.writer.put(data, block=True))
+
+
+class TCPStorageServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class UnixStorageServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def run_stream_server(writer=None):
+    writer = writer or StorageWriter()
+    if not writer.is_alive():
+        writer.start()
+    if TRANSPORT == 'unix':
+        path = BASE_DIR.joinpath(UNIX_SOCKET)
+        path.unlink(missing_ok=True)
+        server = UnixStorageServer(str(path), FrameHandler)
+    else:
+        server = TCPStorageServer(SOCKET_ADDRESS, FrameHandler)
+    server.writer = writer
+    server.clients = {}  # client id -> (last stored sequence number, its writer ticket)
+    server.lock = Lock()
+    logging.info(f'Storage server started ({TRANSPORT})')
     try:
-        data_dict = {str(datetime.now()): {key: value for key, value in [i.split('=') for i in data_parse.split('&')]}}
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info('Destroy server')
+    finally:
+        server.server_close()
+        writer.stop()
+        logging.info(f'Storage writer {writer.stats()}')
 
-        with open(BASE_DIR.joinpath('storage/data.json'), 'r+', encoding='utf-8') as fd:
-            try:
-                data_file = json.load(fd)
-            except:
-                data_file = {}
-            data_file.update(data_dict)
-            fd.seek(0)
-            json.dump(data_file, fd, ensure_ascii=False, indent=4)
-            fd.truncate()
+def get_store():
+    global store
+    with globals_lock:
+        if store is None:
+            store = MessageStore(BASE_DIR.joinpath('storage'))
+        return store
+
+def get_index():
+    # loaded from the store once, then kept up to date by the store itself
+    global index
+    message_store = get_store()  # taken before globals_lock, which is not reentrant
+    with globals_lock:
+        if index is None:
+            with message_store.lock:
+                index = MessageIndex(message_store.read_all())
+                message_store.listeners.append(index.add_many)
+        return index
+
+def parse_data(data):
+    data_parse = urllib.parse.unquote_plus(data.decode())
+    try:
+        return {key: value for key, value in [i.split('=') for i in data_parse.split('&')]}
     except ValueError as err:
         logging.error(f'For data {data_parse} error {err}')
+
+def save_batch(batch):
+    items = [(key, message) for key, message in ((key, parse_data(data)) for key, data in batch) if message is not None]
+    if not items:
+        return
+    try:
+        get_store().append_many(items)
     except OSError as err:
-        logging.error(f'Write data {data_parse} error {err}')
+        logging.error(f'Write data {items} error {err}')
+
+def save_data(data):
+    save_batch([(str(datetime.now()), data)])
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO, format='%(threadName)s %(message)s')
@@ -107,8 +396,10 @@ if __name__ == '__main__':
         with open(FILE_STORAGE, 'w', encoding='utf-8') as fd:
             json.dump({}, fd, ensure_ascii=False)
 
-    thread_server = Thread(target=run_http_server)
+    thread_server = Thread(target=run_http_server, daemon=True)
     thread_server.start()
     
-    thread_socket = Thread(target=run_socket_server('127.0.0.1', 5000))
-    thread_socket.start()
+    if TRANSPORT == 'udp':
+        run_socket_server(*SOCKET_ADDRESS)
+    else:
+        run_stream_server()
@@ -0,0 +1,182 @@
+import bisect
+import json
+import os
+import pathlib
+import sys
+from threading import Lock, RLock
+
+SNAPSHOT = 'data.json'
+SEGMENT_PREFIX = 'messages-'
+
+
+class MessageStore:
+    """Append-only message storage.
+
+    New messages are appended as one json object per line to the current
+    segment file. Once the segments hold at least compact_every messages and
+    at least as many as data.json (the dict view read by the existing
+    consumers), they are merged into it, so compaction stays amortized O(1).
+    """
+
+    def __init__(self, directory, compact_every=1000, fsync=True):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.lock = RLock()
+        segments = self.segments()
+        self.segment_no = int(segments[-1].stem[len(SEGMENT_PREFIX):]) + 1 if segments else 1
+        self.fd = None
+        self.count = sum(1 for path in segments for _ in self.read_segment(path))
+        self.snapshot_count = len(self.read_snapshot())
+        self.listeners = []  # called with every list of appended (key, value) pairs
+
+    def segments(self):
+        return sorted(self.directory.glob(f'{SEGMENT_PREFIX}*.jsonl'))
+
+    def open_segment(self):
+        path = self.directory / f'{SEGMENT_PREFIX}{self.segment_no:06d}.jsonl'
+        self.fd = open(path, 'a', encoding='utf-8')
+
+    def append(self, key, value):
+        self.append_many([(key, value)])
+
+    def append_many(self, items):
+        lines = ''.join(json.dumps({key: value}, ensure_ascii=False) + '\n' for key, value in items)
+        with self.lock:
+            if self.fd is None:
+                self.open_segment()
+            self.fd.write(lines)
+            self.fd.flush()
+            if self.fsync:
+                os.fsync(self.fd.fileno())
+            self.count += len(items)
+            for listener in self.listeners:
+                listener(items)
+            if self.compact_every and self.count >= max(self.compact_every, self.snapshot_count):
+                self.compact()
+
+    @staticmethod
+    def read_segment(path):
+        # a line cut by a crash is skipped, all complete lines before it are kept
+        with open(path, encoding='utf-8') as fd:
+            for line in fd:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def read_snapshot(self):
+        try:
+            with open(self.directory / SNAPSHOT, encoding='utf-8') as fd:
+                return json.load(fd)
+        except (OSError, ValueError):
+            return {}
+
+    def read_all(self):
+        with self.lock:
+            data = self.read_snapshot()
+            for path in self.segments():
+                for item in self.read_segment(path):
+                    data.update(item)
+        return data
+
+    def compact(self):
+        # merges all segments into data.json; the new snapshot replaces the old one atomically
+        with self.lock:
+            if self.fd is not None:
+                self.fd.close()
+                self.fd = None
+                self.segment_no += 1
+            segments = self.segments()
+            data = self.read_all()
+            tmp = self.directory / f'{SNAPSHOT}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as fd:
+                json.dump(data, fd, ensure_ascii=False, indent=4)
+                fd.flush()
+                os.fsync(fd.fileno())
+            os.replace(tmp, self.directory / SNAPSHOT)
+            for path in segments:
+                path.unlink()
+            self.count = 0
+            self.snapshot_count = len(data)
+        return data
+
+    def export(self, path=None):
+        # read-only, so it is safe next to a server appending to (and compacting) the same directory:
+        # if a segment disappears while it is read, the server has merged it into data.json, start over
+        while True:
+            segments = self.segments()
+            data = self.read_snapshot()
+            try:
+                for segment in segments:
+                    for item in self.read_segment(segment):
+                        data.update(item)
+            except FileNotFoundError:
+                continue
+            break
+        if path is not None:
+            tmp = pathlib.Path(f'{path}.tmp')
+            with open(tmp, 'w', encoding='utf-8') as fd:
+                json.dump(data, fd, ensure_ascii=False, indent=4)
+            os.replace(tmp, path)
+        return data
+
+    def close(self):
+        with self.lock:
+            if self.fd is not None:
+                self.fd.close()
+                self.fd = None
+
+
+class MessageIndex:
+    """Messages sorted by their timestamp key, kept in memory for queries."""
+
+    def __init__(self, data=None):
+        self.lock = Lock()
+        self.keys = sorted(data or {})
+        self.messages = dict(data or {})
+
+    def add_many(self, items):
+        with self.lock:
+            for key, value in items:
+                if key not in self.messages:
+                    if not self.keys or key > self.keys[-1]:
+                        self.keys.append(key)
+                    else:
+                        bisect.insort(self.keys, key)
+                self.messages[key] = value
+
+    def query(self, start=None, end=None, filters=None, cursor=None, limit=50):
+        # start/end are inclusive key prefixes, e.g. '2023-04-23' or '2023-04-23 10:00';
+        # cursor is the last key of the previous page
+        filters = filters or {}
+        with self.lock:
+            lo = bisect.bisect_left(self.keys, start) if start else 0
+            if cursor:
+                lo = max(lo, bisect.bisect_right(self.keys, cursor))
+            hi = bisect.bisect_right(self.keys, end + '\uffff') if end else len(self.keys)
+            result = []
+            for i in range(lo, hi):
+                key = self.keys[i]
+                message = self.messages[key]
+                if all(message.get(field) == value for field, value in filters.items()):
+                    result.append({'time': key, **message})
+                    if len(result) == limit:
+                        break
+            else:
+                return result, None
+        next_cursor = result[-1]['time'] if i + 1 < hi else None
+        return result, next_cursor
+
+
+if __name__ == '__main__':
+    # python message_store.py export [file] - writes data.json merged with all segments to file
+    # (default storage/export.json); the storage directory itself is not changed
+    if len(sys.argv) < 2 or sys.argv[1] != 'export':
+        print('Usage: python message_store.py export [file]')
+        sys.exit(1)
+    directory = pathlib.Path(__file__).parent / 'storage'
+    store = MessageStore(directory)
+    data = store.export(sys.argv[2] if len(sys.argv) > 2 else directory / 'export.json')
+    print(f'Exported {len(data)} messages')
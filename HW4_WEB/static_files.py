@@ -0,0 +1,123 @@
+import email.utils
+import gzip
+import mimetypes
+import os
+import pathlib
+from threading import Lock
+
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+class StaticFile:
+
+    def __init__(self, path, stat, max_cached, gzip_min):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        self.last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        self.content_type = mimetypes.guess_type(path.name)[0] or 'text/plain'
+        self.body = None
+        self.gzip_body = None
+        self.gzip_path = None
+        compressible = self.content_type.startswith(COMPRESSIBLE)
+        if self.size <= max_cached:
+            self.body = path.read_bytes()
+            if compressible and self.size >= gzip_min:
+                compressed = gzip.compress(self.body, mtime=0)
+                if len(compressed) < self.size:
+                    self.gzip_body = compressed
+        else:
+            # large files are only served compressed when a fresh file.gz was prepared next to them
+            gz = path.with_name(path.name + '.gz')
+            if compressible and gz.exists() and gz.stat().st_mtime_ns >= self.mtime_ns:
+                self.gzip_path = gz
+
+    @property
+    def has_gzip(self):
+        return self.gzip_body is not None or self.gzip_path is not None
+
+    def is_fresh(self, stat):
+        return stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size
+
+
+class StaticFiles:
+    """Files under root: small ones are kept in memory (with a gzip copy), large ones are sent with sendfile."""
+
+    def __init__(self, root, max_cached=256 * 1024, gzip_min=1024):
+        self.root = pathlib.Path(root)
+        self.max_cached = max_cached
+        self.gzip_min = gzip_min
+        self.cache = {}
+        self.lock = Lock()
+
+    def get(self, name):
+        if not self.root.is_absolute():
+            self.root = self.root.resolve()  # resolved on first use, the server may chdir after import
+        path = (self.root / name).resolve()
+        if not path.is_relative_to(self.root):
+            return None
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        if not path.is_file():
+            return None
+        entry = self.cache.get(path)
+        if entry is None or not entry.is_fresh(stat):
+            entry = StaticFile(path, stat, self.max_cached, self.gzip_min)
+            with self.lock:
+                self.cache[path] = entry
+        return entry
+
+
+def not_modified(entry, headers):
+    if headers.get('If-None-Match'):
+        tags = [tag.strip().removeprefix('W/') for tag in headers['If-None-Match'].split(',')]
+        return '*' in tags or entry.etag in tags or entry.etag[:-1] + '-gz"' in tags
+    since = headers.get('If-Modified-Since')
+    if since:
+        try:
+            return int(entry.mtime_ns // 10**9) <= email.utils.parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def send_file(handler, entry, status=200):
+    # writes the response for entry to a BaseHTTPRequestHandler, honouring conditional requests and gzip
+    headers = handler.headers
+    if status == 200 and not_modified(entry, headers):
+        handler.send_response(304)
+        handler.send_header('ETag', entry.etag)
+        handler.send_header('Last-Modified', entry.last_modified)
+        handler.end_headers()
+        return
+    use_gzip = entry.has_gzip and 'gzip' in headers.get('Accept-Encoding', '')
+    handler.send_response(status)
+    handler.send_header('Content-type', entry.content_type)
+    if status == 200:
+        handler.send_header('ETag', entry.etag[:-1] + '-gz"' if use_gzip else entry.etag)
+        handler.send_header('Last-Modified', entry.last_modified)
+        handler.send_header('Cache-Control', 'no-cache')
+    if entry.has_gzip:
+        handler.send_header('Vary', 'Accept-Encoding')
+    if use_gzip and entry.gzip_body is not None:
+        body = entry.gzip_body
+    elif not use_gzip and entry.body is not None:
+        body = entry.body
+    else:
+        body = None
+    path = entry.gzip_path if use_gzip else entry.path
+    if use_gzip:
+        handler.send_header('Content-Encoding', 'gzip')
+    if body is not None:
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+        return
+    with open(path, 'rb') as fd:
+        handler.send_header('Content-Length', str(os.fstat(fd.fileno()).st_size))
+        handler.end_headers()
+        handler.wfile.flush()
+        handler.connection.sendfile(fd)  # os.sendfile, the file is not copied through python
@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import os
+import random
+import resource
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+from time import perf_counter, sleep
+
+import websockets
+
+from stub_server import start_stub
+
+
+def percentiles(values):
+    if not values:
+        return 'n/a'
+    q = statistics.quantiles(values, n=100) if len(values) > 1 else values * 99
+    return (f"p50={q[49] * 1000:.1f}ms p95={q[94] * 1000:.1f}ms "
+            f"p99={q[98] * 1000:.1f}ms max={max(values) * 1000:.1f}ms")
+
+
+class ProcessMonitor(threading.Thread):
+    """Samples CPU time and RSS of a process from /proc (Linux only)."""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def read(self):
+        with open(f'/proc/{self.pid}/stat') as fd:
+            fields = fd.read().rsplit(')', 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / self.ticks
+        with open(f'/proc/{self.pid}/status') as fd:
+            rss = next(int(line.split()[1]) for line in fd if line.startswith('VmRSS'))
+        return perf_counter(), cpu, rss / 1024
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.samples.append(self.read())
+            except (OSError, StopIteration):
+                return
+            sleep(self.interval)
+
+    def report(self):
+        if len(self.samples) < 2:
+            return 'server cpu/memory: n/a'
+        (t0, cpu0, _), (t1, cpu1, _) = self.samples[0], self.samples[-1]
+        peak = max(rss for _, _, rss in self.samples)
+        return f"server cpu={(cpu1 - cpu0) / (t1 - t0) * 100:.0f}% rss_peak={peak:.1f}MB rss_last={self.samples[-1][2]:.1f}MB"
+
+
+class LoadClient:
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.ws = None
+        self.receiver = None  # the event loop keeps only a weak reference to tasks
+
+    async def connect(self, url):
+        start = perf_counter()
+        self.ws = await websockets.connect(url, compression=None, max_queue=None)
+        self.stats['connect'].append(perf_counter() - start)
+        self.receiver = asyncio.create_task(self.receive())
+
+    async def receive(self):
+        try:
+            async for message in self.ws:
+                if 'bench ' in message:
+                    sent = float(message.rsplit(' ', 1)[1])
+                    self.stats['fanout'].append(perf_counter() - sent)
+                elif 'Course' in message:
+                    self.stats['exchange'] += 1
+        except websockets.ConnectionClosed:
+            pass
+
+
+async def drive(clients, rate, duration, make_message, stats, key):
+    # sends rate messages per second from random clients for duration seconds
+    if rate <= 0:
+        return
+    interval = 1 / rate
+    end = perf_counter() + duration
+    next_send = perf_counter()
+    while perf_counter() < end:
+        client = random.choice(clients)
+        try:
+            await client.ws.send(make_message())
+            stats[key] += 1
+        except websockets.ConnectionClosed:
+            stats['errors'] += 1
+        next_send += interval
+        await asyncio.sleep(max(0, next_send - perf_counter()))
+
+
+async def bench(args):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    runner, base_url = await start_stub(latency=args.exchange_latency)
+    tmp = tempfile.mkdtemp()
+    server = subprocess.Popen(
+        [sys.executable, 'server.py', '--host', '127.0.0.1', '--port', str(args.port),
+         '--chat-log', os.path.join(tmp, 'chat.log'), '--history', 'none',
+         '--rates-cache', os.path.join(tmp, 'rates_cache.db')],  # stub rates must not reach the real cache
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, PRIVATBANK_URL=base_url),
+        stderr=subprocess.DEVNULL,
+    )
+    monitor = ProcessMonitor(server.pid)
+    stats = {'connect': [], 'fanout': [], 'exchange': 0, 'chat_sent': 0, 'exchange_sent': 0, 'errors': 0}
+    url = f'ws://127.0.0.1:{args.port}'
+    try:
+        await asyncio.sleep(1)
+        monitor.start()
+        clients = [LoadClient(stats) for _ in range(args.clients)]
+        start = perf_counter()
+        for i in range(0, len(clients), args.connect_batch):
+            await asyncio.gather(*(c.connect(url) for c in clients[i:i + args.connect_batch]))
+        print(f"connected {len(clients)} clients in {perf_counter() - start:.2f}s, setup {percentiles(stats['connect'])}")
+
+        await asyncio.gather(
+            drive(clients, args.chat_rate, args.duration, lambda: f"bench {perf_counter()}", stats, 'chat_sent'),
+            drive(clients, args.exchange_rate, args.duration, lambda: f"exchange {random.randint(1, 3)}", stats, 'exchange_sent'),
+        )
+        await asyncio.sleep(1)
+        expected = stats['chat_sent'] * len(clients)
+        print(f"chat sent={stats['chat_sent']} delivered={len(stats['fanout'])}/{expected} "
+              f"exchange sent={stats['exchange_sent']} replies={stats['exchange']} errors={stats['errors']}")
+        print(f"broadcast fan-out {percentiles(stats['fanout'])}")
+        print(monitor.report())
+        await asyncio.gather(*(c.ws.close() for c in clients), return_exceptions=True)
+    finally:
+        monitor.stopped.set()
+        server.send_signal(signal.SIGINT)
+        server.wait(10)
+        await runner.cleanup()
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test for the websocket chat server')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--connect-batch', type=int, default=100, help='connections opened at once')
+    parser.add_argument('--chat-rate', type=float, default=20, help='chat messages per second')
+    parser.add_argument('--exchange-rate', type=float, default=1, help='exchange commands per second')
+    parser.add_argument('--exchange-latency', type=float, default=0.05, help='stub backend latency, seconds')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    asyncio.run(bench(parser.parse_args()))
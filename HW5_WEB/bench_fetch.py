@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import aiohttp
+
+import main
+from server import ExchangeRates
+from stub_server import start_stub
+
+
+def report(name, latencies, errors, elapsed):
+    if not latencies:
+        print(f"{name:<16} all {errors} requests failed")
+        return
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"{name:<16} requests={len(latencies) + errors:<6} errors={errors:<4} "
+          f"rps={len(latencies) / elapsed:8.1f} p50={q[49] * 1000:7.1f}ms "
+          f"p95={q[94] * 1000:7.1f}ms p99={q[98] * 1000:7.1f}ms max={latencies[-1] * 1000:7.1f}ms")
+
+
+async def run_load(fetch, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    dates = [datetime.now() - timedelta(days=i) for i in range(requests)]
+
+    async def one(date):
+        nonlocal errors
+        async with semaphore:
+            start = perf_counter()
+            if await fetch(date) is None:
+                errors += 1
+            else:
+                latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(one(date) for date in dates))
+    return latencies, errors, perf_counter() - start
+
+
+async def bench_get_data(days, latency):
+    for concurrency in sorted({1, 5, main.CONCURRENCY}):
+        start = perf_counter()
+        data = await main.get_data(days, concurrency=concurrency, use_cache=False)
+        elapsed = perf_counter() - start
+        print(f"get_data days={days} concurrency={concurrency:<3} results={len(data):<3} "
+              f"time={elapsed:.3f}s (~{elapsed / latency:.1f} round-trips)")
+
+
+async def bench_main(requests, concurrency):
+    unlimited = asyncio.Semaphore(requests)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=main.TIMEOUT)) as session:
+        return await run_load(lambda date: main.create_url(session, date, unlimited), requests, concurrency)
+
+
+async def bench_exchange_rates(base_url, requests, concurrency):
+    tmp = tempfile.TemporaryDirectory()  # the server's rates_cache.db is left alone
+    rates = ExchangeRates(['USD', 'EUR'], base_url, os.path.join(tmp.name, 'rates_cache.db'))
+    await rates.create_session()
+
+    async def fetch(date):
+        try:
+            return await rates.bound_fetch(f"{rates.url}{date:%d.%m.%Y}")
+        except (ValueError, aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    try:
+        return await run_load(fetch, requests, concurrency)
+    finally:
+        await rates.close()
+        tmp.cleanup()
+
+
+async def bench(args):
+    runner, base_url = await start_stub(latency=args.latency, jitter=args.jitter,
+                                        error_rate=args.error_rate, seed=0)
+    main.BASE_URL = base_url
+    try:
+        await bench_get_data(10, args.latency)
+        for concurrency in args.concurrency:
+            print(f"concurrency={concurrency}")
+            report('exchange_rates', *await bench_main(args.requests, concurrency))
+            report('pubinfo', *await bench_exchange_rates(base_url, args.requests, concurrency))
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch throughput and latency against the local stub')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    asyncio.run(bench(parser.parse_args()))
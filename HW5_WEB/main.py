@@ -1,67 +1,151 @@
 import aiohttp
+import argparse
 import asyncio
+import collections
+import csv
+import itertools
 import json
+import os
 
 import sys
 from datetime import datetime, timedelta
 
-async def create_url(date):
-    url = 'https://api.privatbank.ua/p24api/exchange_rates?json&date=' + date.strftime('%d.%m.%Y')
-    async with aiohttp.ClientSession() as session:
+from rate_cache import RateCache
+
+BASE_URL = os.environ.get('PRIVATBANK_URL', 'https://api.privatbank.ua')
+CONCURRENCY = 10
+RETRIES = 3
+TIMEOUT = 10
+
+async def create_url(session, date, semaphore, retries=RETRIES, cache=None):
+    day = date.strftime('%d.%m.%Y')
+    if cache is not None:
+        body = cache.get('exchange_rates', day)
+        if body is not None:
+            return json.loads(body)
+    url = f"{BASE_URL}/p24api/exchange_rates?json&date={day}"
+    for attempt in range(1, retries + 1):
         try:
-            async with session.get(url) as resp:
-                return await resp.json()
-        except aiohttp.ClientError as err:
-            print(
-                f"Error data for date {date.strftime('%d.%m.%Y')}: {err}")
-            return None
+            async with semaphore:
+                async with session.get(url) as resp:
+                    resp.raise_for_status()
+                    body = await resp.text()
+            data = json.loads(body)
+            if cache is not None:
+                cache.put('exchange_rates', day, body)
+            return data
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+            if attempt == retries:
+                print(
+                    f"Error data for date {date.strftime('%d.%m.%Y')}: {err!r}")
+                return None
+            await asyncio.sleep(0.1 * 2 ** attempt)
+
+async def get_data(days, concurrency=CONCURRENCY, retries=RETRIES, timeout=TIMEOUT, use_cache=True):
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    cache = RateCache() if use_cache else None
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            dates = [datetime.now() - timedelta(days=i) for i in range(days)]
+            data = await asyncio.gather(*(create_url(session, date, semaphore, retries, cache) for date in dates))
+    finally:
+        if cache is not None:
+            cache.close()
+    return [i for i in data if i is not None]
+
+def parse_rates(data, currencies): #keeps only the requested currencies of one day
+    rates = {}
+    for rate in data['exchangeRate']:
+        if rate.get('currency') in currencies and 'saleRate' in rate and 'purchaseRate' in rate:
+            rates[rate['currency']] = {
+                'sale': rate['saleRate'],
+                'purchase': rate['purchaseRate']}
+    return {data['date']: {currency: rates[currency] for currency in currencies if currency in rates}}
+
+async def iter_range(start, end, currencies, concurrency=CONCURRENCY, retries=RETRIES, timeout=TIMEOUT, use_cache=True):
+    # yields parsed days from end back to start; at most 2 * concurrency days are held in memory
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    cache = RateCache() if use_cache else None
+    total = (end - start).days + 1
+    window = collections.deque()
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            dates = (end - timedelta(days=i) for i in range(total))
+            for done in range(1, total + 1):
+                for date in itertools.islice(dates, 2 * concurrency - len(window)):
+                    window.append(asyncio.create_task(create_url(session, date, semaphore, retries, cache)))
+                data = await window.popleft()
+                print(f'\rfetched {done}/{total}', end='', file=sys.stderr, flush=True)
+                if data is not None:
+                    yield parse_rates(data, currencies)
+    finally:
+        for task in window:
+            task.cancel()
+        if cache is not None:
+            cache.close()
+        print(file=sys.stderr)
 
-async def get_data(days):
-    result = []
-    for i in range(days):
-        date = datetime.now() - timedelta(days=i)
-        data = await create_url(date)
-        if data is not None:
-            result.append(data)
-    return result
+def write_rows(item, fmt, writer=None):
+    if fmt == 'ndjson':
+        print(json.dumps(item, ensure_ascii=False), flush=True)
+        return
+    for date, rates in item.items():
+        for currency, rate in rates.items():
+            writer.writerow([date, currency, rate['sale'], rate['purchase']])
+    sys.stdout.flush()
+
+async def export_range(start, end, currencies, fmt='ndjson', concurrency=CONCURRENCY):
+    writer = None
+    if fmt == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['date', 'currency', 'sale', 'purchase'])
+    async for item in iter_range(start, end, currencies, concurrency):
+        write_rows(item, fmt, writer)
 
 async def main(days, currencies):
     data = await get_data(days)
-    result = []
-    for i in data:
-        item = {}
-        for rate in i['exchangeRate']:
-            item['date'] = i['date']
-            if rate['currency'] in currencies:
-                if 'saleRate' in rate and 'purchaseRate' in rate:
-                    item[rate['currency']] = {
-                        'sale': rate['saleRate'], 
-                        'purchase': rate['purchaseRate']}
-                else:
-                    continue
-        result_item = {item['date']: {}}
-        for currency in currencies:
-            if currency in item:
-                result_item[item['date']][currency] = {
-                    'sale': item[currency]['sale'], 
-                    'purchase': item[currency]['purchase']}
-        result.append(result_item)
+    result = [parse_rates(i, currencies) for i in data]
     print(json.dumps(result, indent=2))
 
+def parse_date(value):
+    return datetime.strptime(value, '%d.%m.%Y')
+
 if __name__ == '__main__':
-    try:
-        days = int(sys.argv[1])
-    except ValueError:
-        print('Enter the period between 1 and 10 days')
-        sys.exit(1)
-    except IndexError:
-        print("Enter the number of days")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='PrivatBank exchange rates')
+    parser.add_argument('days', nargs='?', help='number of days up to today')
+    parser.add_argument('currencies', nargs='*', help='extra currencies, USD and EUR are always shown')
+    parser.add_argument('--from', dest='start', type=parse_date, help='range mode: first day, dd.mm.yyyy')
+    parser.add_argument('--to', dest='end', type=parse_date, help='range mode: last day, dd.mm.yyyy (default today)')
+    parser.add_argument('--format', choices=('ndjson', 'csv'), help='stream rows instead of one json document')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+
     currencies = ['USD', 'EUR']
-    if len(sys.argv) > 2:
-        extra_currencies = [c.upper() for c in sys.argv[2:]]
-        currencies.extend(extra_currencies)
-    if days > 10:
-        print('You can get exchange rates for no more than 10 days')
+    currencies.extend(c.upper() for c in args.currencies if c.upper() not in currencies)
+    end = args.end or datetime.now()
+    if args.start is None:
+        if args.days is None:
+            print("Enter the number of days")
+            sys.exit(1)
+        try:
+            days = int(args.days)
+        except ValueError:
+            print('Enter the period between 1 and 10 days')
+            sys.exit(1)
+        if args.format is None:
+            if days > 10:
+                print('You can get exchange rates for no more than 10 days, use --format for longer periods')
+                sys.exit(1)
+            asyncio.run(main(days, currencies))
+            sys.exit(0)
+        start = end - timedelta(days=days - 1)
+    else:
+        if args.days is not None:
+            currencies.extend(c for c in [args.days.upper()] if c not in currencies)
+        start = args.start
+    if start > end:
+        print('The start date must not be after the end date')
         sys.exit(1)
-    asyncio.run(main(days, currencies))
\ No newline at end of file
+    asyncio.run(export_range(start, end, currencies, args.format or 'ndjson', args.concurrency))
@@ -0,0 +1,52 @@
+import pathlib
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+CACHE_PATH = pathlib.Path(__file__).parent / 'rates_cache.db'
+TODAY_TTL = 300  # seconds, rates of the current day can still change
+
+
+class RateCache:
+    """Raw API responses keyed by (endpoint, date).
+
+    A response is final once it was fetched after its day had ended; such
+    entries are served forever, everything else is revalidated after TODAY_TTL.
+    """
+
+    def __init__(self, path=CACHE_PATH, today_ttl=TODAY_TTL):
+        self.today_ttl = today_ttl
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS rates ('
+            'endpoint TEXT NOT NULL, date TEXT NOT NULL, body TEXT NOT NULL, fetched_at REAL NOT NULL, '
+            'PRIMARY KEY (endpoint, date))'
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def day_end(date):
+        day = datetime.strptime(date, '%d.%m.%Y')
+        return (day + timedelta(days=1)).timestamp()
+
+    def get(self, endpoint, date):
+        row = self.conn.execute(
+            'SELECT body, fetched_at FROM rates WHERE endpoint = ? AND date = ?', (endpoint, date)
+        ).fetchone()
+        if row is None:
+            return None
+        body, fetched_at = row
+        if fetched_at >= self.day_end(date) or time.time() - fetched_at < self.today_ttl:
+            return body
+        return None
+
+    def put(self, endpoint, date, body):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO rates (endpoint, date, body, fetched_at) VALUES (?, ?, ?, ?)',
+            (endpoint, date, body, time.time())
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
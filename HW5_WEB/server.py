@@ -1,54 +1,175 @@
+import argparse
 import asyncio
+import collections
 import logging
 from datetime import datetime, timedelta
 
 import json
+import os
+import pathlib
+import time
 import aiohttp
 import names
 import aiofile
 import aiopath
 import websockets
-from websockets.exceptions import ConnectionClosedOK
+from websockets.exceptions import ConnectionClosed
 from websockets import WebSocketServerProtocol
 
+from rate_cache import CACHE_PATH, RateCache
+
 logging.basicConfig(level=logging.INFO)
 
 
+BASE_URL = os.environ.get('PRIVATBANK_URL', 'https://api.privatbank.ua')
+
+
 class ExchangeRates:
 
-    URL = "https://api.privatbank.ua/p24api/pubinfo?json&exchange&coursid=5&date="
+    RESULT_TTL = 60
+    MAX_DAYS = 10  # the same limit as the console client
+    CONCURRENCY = 10  # upstream requests at a time
+    TIMEOUT = 10  # seconds per upstream request, the same as the console client
 
-    def __init__(self, currency_codes):
+    def __init__(self, currency_codes, base_url=BASE_URL, cache_path=CACHE_PATH):
         self.currency_codes = currency_codes
+        self.cache_path = cache_path
+        self.url = f"{base_url}/p24api/pubinfo?json&exchange&coursid=5&date="
         self.session = None
+        self.semaphore = None
+        self.cache = None
+        self.in_flight = {}
+        self.results = {}
 
     async def create_session(self):
-        self.session = aiohttp.ClientSession()
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.TIMEOUT))
+        self.semaphore = asyncio.Semaphore(self.CONCURRENCY)
+        self.cache = RateCache(self.cache_path)
 
     async def bound_fetch(self, url):
-        async with self.session.get(url) as response:
+        async with self.semaphore, self.session.get(url) as response:
             if response.status != 200:
                 raise ValueError(
                     f"Status code {response.status}")
             return await response.text()
 
-    async def get_rates(self, days=1):
+    async def fetch_day(self, date):
+        day = date.strftime('%d.%m.%Y')
+        response_text = self.cache.get('pubinfo', day)
+        if response_text is None:
+            response_text = await self.bound_fetch(f"{self.url}{day}")
+            self.cache.put('pubinfo', day, response_text)
+        return [
+            f"{date:%d.%m.%Y}, Course {currency['ccy']}:\nSelling {currency['sale']}, Buy {currency['buy']}\n"
+            for currency in json.loads(response_text) if currency['ccy'] in self.currency_codes
+        ]
+
+    async def fetch_rates(self, days):
         today = datetime.now()
         date_range = [today - timedelta(days=x) for x in range(days)]
-        result = ""
-        for date in date_range:
-            url = f"{self.URL}{date.strftime('%d.%m.%Y')}"
-            response_text = await self.bound_fetch(url)
-            response_json = json.loads(response_text)
-            for currency in response_json:
-                if currency['ccy'] in self.currency_codes:
-                    result += (
-                       f"{date:%d.%m.%Y}, Course {currency['ccy']}:\nSelling {currency['sale']}, Buy {currency['buy']}\n"
-                    )
-        return result
+        days_lines = await asyncio.gather(*(self.fetch_day(date) for date in date_range))
+        return "".join(line for lines in days_lines for line in lines)
+
+    async def get_rates(self, days=1):
+        # identical requests share one fetch, formatted results are kept for RESULT_TTL seconds
+        days = min(max(days, 1), self.MAX_DAYS)
+        key = (datetime.now().date(), days)
+        cached = self.results.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self.fetch_rates(days))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda t: self.finish(key, t))
+        return await asyncio.shield(task)
+
+    def finish(self, key, task):
+        self.in_flight.pop(key, None)
+        now = time.monotonic()
+        self.results = {k: v for k, v in self.results.items() if v[0] > now}
+        if not task.cancelled() and task.exception() is None:
+            self.results[key] = (now + self.RESULT_TTL, task.result())
 
     async def close(self):
         await self.session.close()
+        self.cache.close()
+
+
+class ChatLog:
+
+    def __init__(self, path, batch_size=100, flush_interval=1.0, max_bytes=1024 * 1024, backups=3):
+        self.path = aiopath.Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = asyncio.Queue()
+        self.file = None
+        self.size = 0
+        self.task = None
+
+    async def open(self):
+        self.file = aiofile.AIOFile(self.path, 'ab')
+        await self.file.open()
+        self.size = (await self.path.stat()).st_size
+
+    async def start(self):
+        await self.open()
+        self.task = asyncio.create_task(self.run())
+
+    def write(self, entry: str):
+        self.queue.put_nowait(f'{datetime.now().strftime("%d.%m.%Y %H:%M:%S")}: {entry}\n')
+
+    async def rotate(self):
+        await self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = aiopath.Path(f'{self.path}.{i}')
+            if await src.exists():
+                await src.rename(f'{self.path}.{i + 1}')
+        if self.backups:
+            await self.path.rename(f'{self.path}.1')
+        else:
+            await self.path.unlink()
+        await self.open()
+
+    async def flush(self, batch):
+        data = "".join(batch).encode()
+        if self.max_bytes and self.size and self.size + len(data) > self.max_bytes:
+            await self.rotate()
+        await self.file.write(data, offset=self.size)
+        await self.file.fsync()
+        self.size += len(data)
+
+    async def run(self):
+        # waits for the first entry, then collects up to batch_size entries for at most flush_interval seconds
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            if None in batch:
+                closing = True
+                batch = [entry for entry in batch if entry is not None]
+            if batch:
+                try:
+                    await self.flush(batch)
+                except OSError as err:
+                    logging.error(f"Chat log write error {err}")
+
+    async def close(self):
+        if self.task is not None:
+            self.queue.put_nowait(None)
+            await self.task
+            self.task = None
+        if self.file is not None:
+            await self.file.close()
+            self.file = None
 
 
 class Server:
@@ -56,25 +177,78 @@ class Server:
     clients = set()
     currency_codes = ['USD', 'EUR']
     exchange_rates = ExchangeRates(currency_codes)
+    chat_log = ChatLog(aiopath.Path(__file__).parent / "chat.log")
+    queue_size = 100  # outbound messages buffered per client
+    slow_policy = 'drop'  # 'drop' the oldest queued message or 'disconnect' the slow client
+    dropped = 0
+    closing = set()  # close tasks of slow clients, referenced until they finish
+    history = collections.deque(maxlen=50)  # last messages replayed to new clients
+    history_path = pathlib.Path(__file__).parent / "history.json"  # None disables the persisted tail
 
     async def register(self, ws: WebSocketServerProtocol):
         ws.name = names.get_full_name()
+        ws.outbox = asyncio.Queue(self.queue_size)
+        ws.writer = asyncio.create_task(self.client_writer(ws))
+        if self.history:
+            ws.outbox.put_nowait("\n".join(self.history))
         self.clients.add(ws)
         logging.info(f"{ws.remote_address} connects")
 
+    def load_history(self):
+        if self.history_path is None or not self.history_path.exists():
+            return
+        try:
+            with open(self.history_path, encoding='utf-8') as fd:
+                self.history.extend(json.load(fd))
+        except (OSError, ValueError) as err:
+            logging.error(f"History load error {err}")
+
+    def save_history(self):
+        if self.history_path is None:
+            return
+        try:
+            with open(self.history_path, 'w', encoding='utf-8') as fd:
+                json.dump(list(self.history), fd, ensure_ascii=False)
+        except OSError as err:
+            logging.error(f"History save error {err}")
+
     async def unregister(self, ws: WebSocketServerProtocol):
-        self.clients.remove(ws)
+        self.clients.discard(ws)
+        ws.writer.cancel()
         logging.info(f"{ws.remote_address} disconnects")
 
+    async def client_writer(self, ws: WebSocketServerProtocol):
+        try:
+            while True:
+                await ws.send(await ws.outbox.get())
+        except ConnectionClosed:
+            pass
+
+    def enqueue(self, ws: WebSocketServerProtocol, message: str):
+        try:
+            ws.outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            if self.slow_policy == 'disconnect':
+                self.clients.discard(ws)
+                task = asyncio.create_task(ws.close(1013, 'slow consumer'))
+                self.closing.add(task)
+                task.add_done_callback(self.closing.discard)
+                logging.warning(f"{ws.remote_address} is too slow and was disconnected")
+                return
+            ws.outbox.get_nowait()
+            ws.outbox.put_nowait(message)
+            Server.dropped += 1
+
     async def send_to_clients(self, message: str):
-        if self.clients:
-            [await client.send(message) for client in self.clients]
+        self.history.append(message)
+        for client in list(self.clients):
+            self.enqueue(client, message)
 
     async def ws_handler(self, ws: WebSocketServerProtocol):
         await self.register(ws)
         try:
             await self.distrubute(ws)
-        except ConnectionClosedOK:
+        except ConnectionClosed:
             pass
         finally:
             await self.unregister(ws)
@@ -86,20 +260,48 @@ class Server:
                     days = int(message.split()[1])
                 except:
                     days = 1
-                result = await self.exchange_rates.get_rates(days)
+                try:
+                    result = await self.exchange_rates.get_rates(days)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+                    # only the requester hears about a failed upstream, the other clients stay connected
+                    logging.error(f"Exchange rates error {err!r}")
+                    self.enqueue(ws, f"Exchange rates are not available now: {err!r}")
+                    continue
                 await self.send_to_clients(result)
-
-                async with aiofile.async_open(aiopath.Path(__file__).parent / "chat.log", mode="a") as f:
-                    await f.write(f'{datetime.now().strftime("%d.%m.%Y %H:%M:%S")}:\n{result}\n')
+                self.chat_log.write(f"{ws.name}: {message}\n{result}")
             else:
                 await self.send_to_clients(f"{ws.name}: {message}")
+                self.chat_log.write(f"{ws.name}: {message}")
 
 
-async def main():
+async def main(host='localhost', port=8080):
     server = Server()
     await server.exchange_rates.create_session()
-    async with websockets.serve(server.ws_handler, 'localhost', 8080):
-        await asyncio.Future()
+    await server.chat_log.start()
+    server.load_history()
+    try:
+        async with websockets.serve(server.ws_handler, host, port):
+            await asyncio.Future()
+    finally:
+        server.save_history()
+        await server.chat_log.close()
+        await server.exchange_rates.close()
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Websocket chat server')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--chat-log', help='chat log file, default chat.log next to this script')
+    parser.add_argument('--history', help='persisted history file, "none" to disable')
+    parser.add_argument('--rates-cache', help='exchange rates cache database, default rates_cache.db next to this script')
+    args = parser.parse_args()
+    if args.rates_cache:
+        Server.exchange_rates.cache_path = args.rates_cache
+    if args.chat_log:
+        Server.chat_log = ChatLog(args.chat_log)
+    if args.history:
+        Server.history_path = None if args.history == 'none' else pathlib.Path(args.history)
+    try:
+        asyncio.run(main(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
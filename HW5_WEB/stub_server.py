@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import sqlite3
+
+from aiohttp import web
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / 'fixtures'
+ENDPOINTS = ('exchange_rates', 'pubinfo')
+
+
+class Fixtures:
+    """Recorded responses for both API shapes.
+
+    Lookup order: fixtures/<endpoint>/<dd.mm.yyyy>.json, then a rates_cache.db
+    recorded by the clients, then fixtures/<endpoint>.json with the date replaced.
+    """
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, cache_path=None):
+        self.fixtures_dir = pathlib.Path(fixtures_dir)
+        self.templates = {
+            endpoint: (self.fixtures_dir / f'{endpoint}.json').read_text(encoding='utf-8')
+            for endpoint in ENDPOINTS
+        }
+        self.recorded = {}
+        if cache_path is not None:
+            conn = sqlite3.connect(cache_path)
+            self.recorded = {(endpoint, date): body for endpoint, date, body in
+                             conn.execute('SELECT endpoint, date, body FROM rates')}
+            conn.close()
+
+    def get(self, endpoint, date):
+        path = self.fixtures_dir / endpoint / f'{date}.json'
+        if path.exists():
+            return path.read_text(encoding='utf-8')
+        if (endpoint, date) in self.recorded:
+            return self.recorded[endpoint, date]
+        template = self.templates[endpoint]
+        if endpoint == 'exchange_rates':
+            data = json.loads(template)
+            data['date'] = date
+            return json.dumps(data)
+        return template
+
+
+def create_app(latency=0.0, jitter=0.0, error_rate=0.0, stall_rate=0.0, stall=30.0,
+               fixtures_dir=FIXTURES_DIR, cache_path=None, seed=None):
+    fixtures = Fixtures(fixtures_dir, cache_path)
+    rnd = random.Random(seed)
+    stats = {'requests': 0, 'errors': 0, 'stalls': 0}
+
+    def handler(endpoint):
+        async def handle(request):
+            stats['requests'] += 1
+            await asyncio.sleep(latency + rnd.uniform(0, jitter))
+            if rnd.random() < stall_rate:
+                stats['stalls'] += 1
+                await asyncio.sleep(stall)
+            if rnd.random() < error_rate:
+                stats['errors'] += 1
+                raise web.HTTPInternalServerError(text='injected error')
+            body = fixtures.get(endpoint, request.query.get('date', ''))
+            return web.Response(text=body, content_type='application/json')
+        return handle
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app['stats'] = stats
+    app.router.add_get('/p24api/exchange_rates', handler('exchange_rates'))
+    app.router.add_get('/p24api/pubinfo', handler('pubinfo'))
+    app.router.add_get('/stats', get_stats)
+    return app
+
+
+async def start_stub(host='127.0.0.1', port=0, **kwargs):
+    runner = web.AppRunner(create_app(**kwargs), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f'http://{host}:{port}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local replay stub of the PrivatBank API')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency, seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of responses with status 500')
+    parser.add_argument('--stall-rate', type=float, default=0.0, help='share of responses delayed by --stall')
+    parser.add_argument('--stall', type=float, default=30.0)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--cache', help='replay responses recorded in a rates_cache.db')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    app = create_app(args.latency, args.jitter, args.error_rate, args.stall_rate, args.stall,
+                     args.fixtures, args.cache, args.seed)
+    web.run_app(app, host='127.0.0.1', port=args.port)
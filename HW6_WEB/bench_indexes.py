@@ -0,0 +1,92 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+from time import perf_counter
+
+from main import QueryRegistry
+from upgrade_db import upgrade_db
+
+
+def seed(database, grades, students, groups, subjects, teachers):
+    # synthetic data generated inside sqlite, fast enough for millions of grades
+    with open('create_tables.sql') as fl:
+        schema = fl.read()
+    connect = sqlite3.connect(database)
+    connect.execute('PRAGMA journal_mode = OFF')
+    connect.execute('PRAGMA synchronous = OFF')
+    connect.executescript(schema)
+    numbers = 'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?) '
+    connect.execute(numbers + "INSERT INTO groups (id, name) SELECT x, 'group ' || x FROM n", (groups,))
+    connect.execute(numbers + "INSERT INTO teachers (id, fullname, firstname, lastname) "
+                    "SELECT x, 'teacher ' || x, 'teacher', x FROM n", (teachers,))
+    connect.execute(numbers + "INSERT INTO subjects (id, name, teacher_id) SELECT x, 'subject ' || x, "
+                    "(x - 1) % ? + 1 FROM n", (subjects, teachers))
+    connect.execute(numbers + "INSERT INTO students (id, fullname, firstname, lastname, group_id) "
+                    "SELECT x, 'student ' || x, 'student', x, (x - 1) % ? + 1 FROM n", (students, groups))
+    connect.execute(numbers + "INSERT INTO grades (grade, date_of, student_id, subject_id) "
+                    "SELECT abs(random()) % 12 + 1, date('2022-09-01', '+' || (abs(random()) % 270) || ' days'), "
+                    "abs(random()) % ? + 1, abs(random()) % ? + 1 FROM n", (grades, students, subjects))
+    connect.commit()
+    connect.close()
+
+
+def measure(database, repeat):
+    registry = QueryRegistry(database)
+    results = {}
+    for number in registry.queries:
+        sql, defaults = registry.queries[number]
+        plan = [row[-1] for row in registry.connection.execute('EXPLAIN QUERY PLAN ' + sql, defaults)]
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            registry.execute(number)
+            timings.append(perf_counter() - start)
+        results[number] = (statistics.median(timings), plan)
+    registry.close()
+    return results
+
+
+def print_plan(number, plan):
+    for line in plan:
+        print(f"    q{number:<3} {line}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query timings and plans before and after upgrade_db.py')
+    parser.add_argument('--grades', type=int, default=1_000_000)
+    parser.add_argument('--students', type=int, default=10_000)
+    parser.add_argument('--groups', type=int, default=30)
+    parser.add_argument('--subjects', type=int, default=50)
+    parser.add_argument('--teachers', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--keep', help='copy the upgraded database to this path')
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    tmp = tempfile.mkdtemp()
+    database = os.path.join(tmp, 'bench.db')
+    try:
+        start = perf_counter()
+        seed(database, args.grades, args.students, args.groups, args.subjects, args.teachers)
+        print(f"seeded {args.grades} grades in {perf_counter() - start:.1f}s")
+        before = measure(database, args.repeat)
+        start = perf_counter()
+        upgrade_db(database)
+        print(f"upgrade_db (indexes + ANALYZE) took {perf_counter() - start:.1f}s")
+        after = measure(database, args.repeat)
+
+        print(f"{'query':<6} {'before':>10} {'after':>10} {'speedup':>8}")
+        for number in before:
+            t0, t1 = before[number][0], after[number][0]
+            print(f"q{number:<5} {t0 * 1000:8.1f}ms {t1 * 1000:8.1f}ms {t0 / t1:7.1f}x")
+        for title, results in (('before', before), ('after', after)):
+            print(f"\nquery plans {title}:")
+            for number, (_, plan) in results.items():
+                print_plan(number, plan)
+        if args.keep:
+            shutil.copy(database, args.keep)
+    finally:
+        shutil.rmtree(tmp)
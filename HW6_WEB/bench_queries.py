@@ -0,0 +1,107 @@
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+from time import perf_counter
+
+from bench_indexes import seed
+from main import QueryRegistry
+from upgrade_db import upgrade_db
+
+STAGES = ('plain', 'indexes', 'stats')  # stats = indexes + summary tables, read by query_N_stats.sql
+
+
+def scale_sizes(grades):
+    # table sizes for a number of grades, about 100 grades per student as in fill_data.py
+    students = max(30, grades // 100)
+    groups = max(3, students // 30)
+    subjects = min(50, max(8, students // 100))
+    teachers = max(5, subjects // 3)
+    return {'grades': grades, 'students': students, 'groups': groups, 'subjects': subjects, 'teachers': teachers}
+
+
+def sample_params(names, sizes, rnd):
+    limits = {'student_id': sizes['students'], 'group_id': sizes['groups'],
+              'subject_id': sizes['subjects'], 'teacher_id': sizes['teachers']}
+    return {name: rnd.randint(1, limits[name]) for name in names}
+
+
+def percentiles(timings):
+    q = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return {'p50_ms': round(q[49] * 1000, 3), 'p95_ms': round(q[94] * 1000, 3),
+            'p99_ms': round(q[98] * 1000, 3), 'max_ms': round(max(timings) * 1000, 3)}
+
+
+def measure(database, stage, sizes, samples, seed_value):
+    registry = QueryRegistry(database, variant='stats' if stage == 'stats' else None)
+    rows = []
+    try:
+        for number, (sql, defaults) in registry.queries.items():
+            rnd = random.Random(seed_value + number)  # the same parameters for every stage
+            params = [sample_params(defaults, sizes, rnd) for _ in range(samples)]
+            plan = [row[-1] for row in registry.connection.execute('EXPLAIN QUERY PLAN ' + sql, params[0])]
+            registry.execute(number, **params[0])  # warm the page cache
+            timings = []
+            for values in params:
+                start = perf_counter()
+                registry.execute(number, **values)
+                timings.append(perf_counter() - start)
+            rows.append({'scale': sizes['grades'], 'stage': stage, 'query': number, 'samples': samples,
+                         **percentiles(timings), 'plan': '; '.join(plan)})
+            print("| {scale:>9} | {stage:<7} | q{query:<3} | {p50_ms:>10.3f} | {p95_ms:>10.3f} | {p99_ms:>10.3f} |".format(**rows[-1]))
+    finally:
+        registry.close()
+    return rows
+
+
+def run(scales, stages, samples, seed_value=0):
+    rows = []
+    for grades in scales:
+        sizes = scale_sizes(grades)
+        tmp = tempfile.mkdtemp()
+        database = os.path.join(tmp, 'university.db')
+        try:
+            start = perf_counter()
+            seed(database, **sizes)
+            print(f"seeded {sizes} in {perf_counter() - start:.1f}s")
+            for stage in STAGES:
+                if stage == 'indexes':
+                    upgrade_db(database)
+                elif stage == 'stats':
+                    upgrade_db(database, aggregates=True)
+                if stage in stages:
+                    rows.extend(measure(database, stage, sizes, samples, seed_value))
+        finally:
+            shutil.rmtree(tmp)
+    return rows
+
+
+def save(rows, path):
+    if path.endswith(".json"):
+        with open(path, "w", encoding="utf-8") as fd:
+            json.dump(rows, fd, indent=4)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as fd:
+            writer = csv.DictWriter(fd, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of the 12 reports at several data scales")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1000, 100000], help="grades, e.g. 1000 100000 10000000")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--samples", type=int, default=20, help="parameter sets per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="queries_benchmark.csv", help="results file, .csv or .json")
+    args = parser.parse_args()
+    out = os.path.abspath(args.out)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    rows = run(args.scales, args.stages, args.samples, args.seed)
+    save(rows, out)
+    print(f"Results saved to {out}")
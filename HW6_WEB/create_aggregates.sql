@@ -0,0 +1,250 @@
+-- Summary tables for the average-grade queries (query_N_stats.sql), applied by upgrade_db.py --aggregates.
+-- Each row holds the sum and the count of the grades it covers; the triggers below keep them current.
+BEGIN TRANSACTION;
+
+-- the triggers live on grades/students/subjects and survive the summary tables being recreated
+DROP TRIGGER IF EXISTS grades_stats_insert;
+DROP TRIGGER IF EXISTS grades_stats_delete;
+DROP TRIGGER IF EXISTS grades_stats_update;
+DROP TRIGGER IF EXISTS students_group_stats;
+DROP TRIGGER IF EXISTS subjects_teacher_stats;
+DROP TRIGGER IF EXISTS students_delete_stats;
+DROP TRIGGER IF EXISTS subjects_delete_stats;
+DROP TRIGGER IF EXISTS students_id_stats;
+DROP TRIGGER IF EXISTS subjects_id_stats;
+
+DROP TABLE IF EXISTS student_stats;
+CREATE TABLE student_stats (
+    student_id INTEGER PRIMARY KEY,
+    grade_sum INTEGER NOT NULL,
+    grade_count INTEGER NOT NULL
+);
+-- query_1_stats: the top of the leaderboard is read from this index
+CREATE INDEX ix_student_stats_avg ON student_stats (grade_sum * 1.0 / grade_count);
+
+DROP TABLE IF EXISTS student_subject_stats;
+CREATE TABLE student_subject_stats (
+    student_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    grade_sum INTEGER NOT NULL,
+    grade_count INTEGER NOT NULL,
+    PRIMARY KEY (student_id, subject_id)
+) WITHOUT ROWID;
+
+DROP TABLE IF EXISTS group_subject_stats;
+CREATE TABLE group_subject_stats (
+    subject_id INTEGER NOT NULL,
+    group_id INTEGER NOT NULL,
+    grade_sum INTEGER NOT NULL,
+    grade_count INTEGER NOT NULL,
+    PRIMARY KEY (subject_id, group_id)
+) WITHOUT ROWID;
+
+-- per subject: the overall average and moving a subject to another teacher
+DROP TABLE IF EXISTS subject_stats;
+CREATE TABLE subject_stats (
+    subject_id INTEGER PRIMARY KEY,
+    grade_sum INTEGER NOT NULL,
+    grade_count INTEGER NOT NULL
+);
+
+DROP TABLE IF EXISTS teacher_stats;
+CREATE TABLE teacher_stats (
+    teacher_id INTEGER PRIMARY KEY,
+    grade_sum INTEGER NOT NULL,
+    grade_count INTEGER NOT NULL
+);
+
+-- backfill from the existing grades
+INSERT INTO student_stats (student_id, grade_sum, grade_count)
+SELECT student_id, SUM(grade), COUNT(*) FROM grades WHERE student_id IS NOT NULL GROUP BY student_id;
+
+INSERT INTO student_subject_stats (student_id, subject_id, grade_sum, grade_count)
+SELECT student_id, subject_id, SUM(grade), COUNT(*) FROM grades
+WHERE student_id IS NOT NULL AND subject_id IS NOT NULL GROUP BY student_id, subject_id;
+
+INSERT INTO group_subject_stats (subject_id, group_id, grade_sum, grade_count)
+SELECT s.subject_id, students.group_id, SUM(s.grade_sum), SUM(s.grade_count) FROM student_subject_stats AS s
+JOIN students ON students.id = s.student_id
+WHERE students.group_id IS NOT NULL GROUP BY s.subject_id, students.group_id;
+
+INSERT INTO subject_stats (subject_id, grade_sum, grade_count)
+SELECT subject_id, SUM(grade), COUNT(*) FROM grades WHERE subject_id IS NOT NULL GROUP BY subject_id;
+
+INSERT INTO teacher_stats (teacher_id, grade_sum, grade_count)
+SELECT subjects.teacher_id, SUM(s.grade_sum), SUM(s.grade_count) FROM subject_stats AS s
+JOIN subjects ON subjects.id = s.subject_id
+WHERE subjects.teacher_id IS NOT NULL GROUP BY subjects.teacher_id;
+
+-- a new grade is added to every summary row it belongs to
+CREATE TRIGGER grades_stats_insert AFTER INSERT ON grades
+BEGIN
+    INSERT INTO student_stats (student_id, grade_sum, grade_count)
+    SELECT NEW.student_id, NEW.grade, 1 WHERE NEW.student_id IS NOT NULL
+    ON CONFLICT (student_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+
+    INSERT INTO student_subject_stats (student_id, subject_id, grade_sum, grade_count)
+    SELECT NEW.student_id, NEW.subject_id, NEW.grade, 1 WHERE NEW.student_id IS NOT NULL AND NEW.subject_id IS NOT NULL
+    ON CONFLICT (student_id, subject_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+
+    INSERT INTO group_subject_stats (subject_id, group_id, grade_sum, grade_count)
+    SELECT NEW.subject_id, group_id, NEW.grade, 1 FROM students
+    WHERE students.id = NEW.student_id AND group_id IS NOT NULL AND NEW.subject_id IS NOT NULL
+    ON CONFLICT (subject_id, group_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+
+    INSERT INTO subject_stats (subject_id, grade_sum, grade_count)
+    SELECT NEW.subject_id, NEW.grade, 1 WHERE NEW.subject_id IS NOT NULL
+    ON CONFLICT (subject_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+
+    INSERT INTO teacher_stats (teacher_id, grade_sum, grade_count)
+    SELECT teacher_id, NEW.grade, 1 FROM subjects WHERE subjects.id = NEW.subject_id AND teacher_id IS NOT NULL
+    ON CONFLICT (teacher_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+END;
+
+-- a removed grade is subtracted, rows left without grades are deleted
+CREATE TRIGGER grades_stats_delete AFTER DELETE ON grades
+BEGIN
+    UPDATE student_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE student_id = OLD.student_id;
+    DELETE FROM student_stats WHERE student_id = OLD.student_id AND grade_count = 0;
+
+    UPDATE student_subject_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE student_id = OLD.student_id AND subject_id = OLD.subject_id;
+    DELETE FROM student_subject_stats WHERE student_id = OLD.student_id AND subject_id = OLD.subject_id AND grade_count = 0;
+
+    UPDATE group_subject_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE subject_id = OLD.subject_id AND group_id = (SELECT group_id FROM students WHERE id = OLD.student_id);
+    DELETE FROM group_subject_stats WHERE subject_id = OLD.subject_id AND grade_count = 0;
+
+    UPDATE subject_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE subject_id = OLD.subject_id;
+    DELETE FROM subject_stats WHERE subject_id = OLD.subject_id AND grade_count = 0;
+
+    UPDATE teacher_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE teacher_id = (SELECT teacher_id FROM subjects WHERE id = OLD.subject_id);
+    DELETE FROM teacher_stats WHERE teacher_id = (SELECT teacher_id FROM subjects WHERE id = OLD.subject_id) AND grade_count = 0;
+END;
+
+-- an edited grade is subtracted with its old values and added with the new ones
+CREATE TRIGGER grades_stats_update AFTER UPDATE OF grade, student_id, subject_id ON grades
+BEGIN
+    UPDATE student_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE student_id = OLD.student_id;
+    DELETE FROM student_stats WHERE student_id = OLD.student_id AND grade_count = 0;
+
+    UPDATE student_subject_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE student_id = OLD.student_id AND subject_id = OLD.subject_id;
+    DELETE FROM student_subject_stats WHERE student_id = OLD.student_id AND subject_id = OLD.subject_id AND grade_count = 0;
+
+    UPDATE group_subject_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE subject_id = OLD.subject_id AND group_id = (SELECT group_id FROM students WHERE id = OLD.student_id);
+    DELETE FROM group_subject_stats WHERE subject_id = OLD.subject_id AND grade_count = 0;
+
+    UPDATE subject_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE subject_id = OLD.subject_id;
+    DELETE FROM subject_stats WHERE subject_id = OLD.subject_id AND grade_count = 0;
+
+    UPDATE teacher_stats SET grade_sum = grade_sum - OLD.grade, grade_count = grade_count - 1
+    WHERE teacher_id = (SELECT teacher_id FROM subjects WHERE id = OLD.subject_id);
+    DELETE FROM teacher_stats WHERE teacher_id = (SELECT teacher_id FROM subjects WHERE id = OLD.subject_id) AND grade_count = 0;
+
+    INSERT INTO student_stats (student_id, grade_sum, grade_count)
+    SELECT NEW.student_id, NEW.grade, 1 WHERE NEW.student_id IS NOT NULL
+    ON CONFLICT (student_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+
+    INSERT INTO student_subject_stats (student_id, subject_id, grade_sum, grade_count)
+    SELECT NEW.student_id, NEW.subject_id, NEW.grade, 1 WHERE NEW.student_id IS NOT NULL AND NEW.subject_id IS NOT NULL
+    ON CONFLICT (student_id, subject_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+
+    INSERT INTO group_subject_stats (subject_id, group_id, grade_sum, grade_count)
+    SELECT NEW.subject_id, group_id, NEW.grade, 1 FROM students
+    WHERE students.id = NEW.student_id AND group_id IS NOT NULL AND NEW.subject_id IS NOT NULL
+    ON CONFLICT (subject_id, group_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+
+    INSERT INTO subject_stats (subject_id, grade_sum, grade_count)
+    SELECT NEW.subject_id, NEW.grade, 1 WHERE NEW.subject_id IS NOT NULL
+    ON CONFLICT (subject_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+
+    INSERT INTO teacher_stats (teacher_id, grade_sum, grade_count)
+    SELECT teacher_id, NEW.grade, 1 FROM subjects WHERE subjects.id = NEW.subject_id AND teacher_id IS NOT NULL
+    ON CONFLICT (teacher_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum, grade_count = grade_count + 1;
+END;
+
+-- a student moved to another group takes their per-subject sums along
+CREATE TRIGGER students_group_stats AFTER UPDATE OF group_id ON students
+WHEN OLD.group_id IS NOT NEW.group_id AND OLD.id IS NEW.id  -- with a new id students_id_stats already moved the sums
+BEGIN
+    UPDATE group_subject_stats SET grade_sum = group_subject_stats.grade_sum - s.grade_sum,
+                                   grade_count = group_subject_stats.grade_count - s.grade_count
+    FROM student_subject_stats AS s
+    WHERE s.student_id = NEW.id AND group_subject_stats.subject_id = s.subject_id AND group_subject_stats.group_id = OLD.group_id;
+    DELETE FROM group_subject_stats WHERE group_id = OLD.group_id AND grade_count = 0;
+
+    INSERT INTO group_subject_stats (subject_id, group_id, grade_sum, grade_count)
+    SELECT subject_id, NEW.group_id, grade_sum, grade_count FROM student_subject_stats
+    WHERE student_id = NEW.id AND NEW.group_id IS NOT NULL
+    ON CONFLICT (subject_id, group_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum,
+                                                     grade_count = grade_count + excluded.grade_count;
+END;
+
+-- a subject given to another teacher takes its sums along
+CREATE TRIGGER subjects_teacher_stats AFTER UPDATE OF teacher_id ON subjects
+WHEN OLD.teacher_id IS NOT NEW.teacher_id AND OLD.id IS NEW.id  -- with a new id subjects_id_stats already moved the sums
+BEGIN
+    UPDATE teacher_stats SET grade_sum = teacher_stats.grade_sum - s.grade_sum,
+                             grade_count = teacher_stats.grade_count - s.grade_count
+    FROM subject_stats AS s
+    WHERE s.subject_id = NEW.id AND teacher_stats.teacher_id = OLD.teacher_id;
+    DELETE FROM teacher_stats WHERE teacher_id = OLD.teacher_id AND grade_count = 0;
+
+    INSERT INTO teacher_stats (teacher_id, grade_sum, grade_count)
+    SELECT NEW.teacher_id, grade_sum, grade_count FROM subject_stats
+    WHERE subject_id = NEW.id AND NEW.teacher_id IS NOT NULL
+    ON CONFLICT (teacher_id) DO UPDATE SET grade_sum = grade_sum + excluded.grade_sum,
+                                           grade_count = grade_count + excluded.grade_count;
+END;
+
+-- with foreign_keys on, deleting a student (or their group) cascades to grades after the student row
+-- is gone, so grades_stats_delete can no longer find the group; its sums are taken out here first
+CREATE TRIGGER students_delete_stats BEFORE DELETE ON students
+BEGIN
+    UPDATE group_subject_stats SET grade_sum = group_subject_stats.grade_sum - s.grade_sum,
+                                   grade_count = group_subject_stats.grade_count - s.grade_count
+    FROM student_subject_stats AS s
+    WHERE s.student_id = OLD.id AND group_subject_stats.subject_id = s.subject_id AND group_subject_stats.group_id = OLD.group_id;
+    DELETE FROM group_subject_stats WHERE group_id = OLD.group_id AND grade_count = 0;
+END;
+
+-- the same for a subject (or its teacher) and teacher_stats
+CREATE TRIGGER subjects_delete_stats BEFORE DELETE ON subjects
+BEGIN
+    UPDATE teacher_stats SET grade_sum = teacher_stats.grade_sum - s.grade_sum,
+                             grade_count = teacher_stats.grade_count - s.grade_count
+    FROM subject_stats AS s
+    WHERE s.subject_id = OLD.id AND teacher_stats.teacher_id = OLD.teacher_id;
+    DELETE FROM teacher_stats WHERE teacher_id = OLD.teacher_id AND grade_count = 0;
+END;
+
+-- an id change cascades to grades after the parent row already has the new id, so grades_stats_update
+-- cannot find the old group/teacher; the sums are taken out here and added back under the new id by it
+CREATE TRIGGER students_id_stats BEFORE UPDATE OF id ON students
+WHEN OLD.id IS NOT NEW.id
+BEGIN
+    UPDATE group_subject_stats SET grade_sum = group_subject_stats.grade_sum - s.grade_sum,
+                                   grade_count = group_subject_stats.grade_count - s.grade_count
+    FROM student_subject_stats AS s
+    WHERE s.student_id = OLD.id AND group_subject_stats.subject_id = s.subject_id AND group_subject_stats.group_id = OLD.group_id;
+    DELETE FROM group_subject_stats WHERE group_id = OLD.group_id AND grade_count = 0;
+END;
+
+CREATE TRIGGER subjects_id_stats BEFORE UPDATE OF id ON subjects
+WHEN OLD.id IS NOT NEW.id
+BEGIN
+    UPDATE teacher_stats SET grade_sum = teacher_stats.grade_sum - s.grade_sum,
+                             grade_count = teacher_stats.grade_count - s.grade_count
+    FROM subject_stats AS s
+    WHERE s.subject_id = OLD.id AND teacher_stats.teacher_id = OLD.teacher_id;
+    DELETE FROM teacher_stats WHERE teacher_id = OLD.teacher_id AND grade_count = 0;
+END;
+
+COMMIT TRANSACTION;
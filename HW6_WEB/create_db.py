@@ -1,11 +1,11 @@
 import sqlite3
 
-def create_db():
+def create_db(database='university.db'):
     with open('create_tables.sql', 'r') as fl:
         sql = fl.read()
 
 
-    with sqlite3.connect('university.db') as connect:
+    with sqlite3.connect(database) as connect:
         cur = connect.cursor()
         cur.executescript(sql)
 
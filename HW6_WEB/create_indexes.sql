@@ -0,0 +1,16 @@
+-- Indexes for query_1.sql ... query_12.sql, applied by upgrade_db.py.
+BEGIN TRANSACTION;
+
+-- query_1, query_9, query_10, query_11: grades of one student (or all students in student order)
+CREATE INDEX IF NOT EXISTS ix_grades_student_subject_grade ON grades (student_id, subject_id, grade);
+
+-- query_2, query_3, query_7, query_8, query_12: grades in one subject, covering grade and date_of
+CREATE INDEX IF NOT EXISTS ix_grades_subject_student_grade_date ON grades (subject_id, student_id, grade, date_of);
+
+-- query_3, query_6, query_7, query_12: students of a group
+CREATE INDEX IF NOT EXISTS ix_students_group ON students (group_id, fullname);
+
+-- query_5, query_8, query_10, query_11: subjects of a teacher
+CREATE INDEX IF NOT EXISTS ix_subjects_teacher ON subjects (teacher_id, name);
+
+COMMIT TRANSACTION;
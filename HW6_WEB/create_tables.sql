@@ -1,5 +1,12 @@
 BEGIN TRANSACTION;
 
+-- summary tables from create_aggregates.sql would be stale after the tables below are recreated
+DROP TABLE IF EXISTS student_stats;
+DROP TABLE IF EXISTS student_subject_stats;
+DROP TABLE IF EXISTS group_subject_stats;
+DROP TABLE IF EXISTS subject_stats;
+DROP TABLE IF EXISTS teacher_stats;
+
 DROP TABLE IF EXISTS groups;
 CREATE TABLE groups (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -1,7 +1,12 @@
-from datetime import datetime
-import faker
-from random import randint
+import argparse
+from datetime import date, timedelta
+from multiprocessing import Pool
+import random
 import sqlite3
+from time import perf_counter
+
+import faker
+
 from create_db import *
 
 fake_data = faker.Faker(locale='uk_UA')
@@ -12,43 +17,93 @@ NUMBER_SUBJECTS = 8
 NUMBER_TEACHERS = 5
 NUMBER_GRADES = 150
 
-def prepare_fake_data() -> tuple():
-
-    for_fake_groups = []
-
-    for _ in range(NUMBER_GROUPS):
-        for_fake_groups.append((fake_data.bothify(text='Group ?#'),))
-
-    for_fake_students = []
-
-    for _ in range(NUMBER_STUDENTS ):
-        name = fake_data.name()
-        *_, firstname, lastname = name.split(' ')
-        for_fake_students.append((name, firstname, lastname, randint(1, len(for_fake_groups))))
+NAME_SAMPLE = 200  # names taken from Faker, larger volumes reuse their parts
+CHUNK_SIZE = 100_000
+DATES = [(date(2022, 1, 1) + timedelta(days=day)).isoformat() for day in range(365)]
 
-    for_fake_teachers = []
 
-    for _ in range(NUMBER_TEACHERS):
-        name = fake_data.name()
-        *_, firstname, lastname = name.split(' ')
-        for_fake_teachers.append((name, firstname, lastname))
+def name_pool(size=NAME_SAMPLE):
+    # Faker is slow, so only a small sample is generated; names are split into (prefix, firstname, lastname)
+    pool = []
+    for _ in range(size):
+        *prefix, firstname, lastname = fake_data.name().split(' ')
+        pool.append((' '.join(prefix), firstname, lastname))
+    return pool
 
-    for_fake_subjects =[]
 
-    for _ in range(NUMBER_SUBJECTS):
-        for_fake_subjects.append((fake_data.job(), randint(1, len(for_fake_teachers))))
+def make_person(rnd, pool):
+    prefix, firstname, _ = rnd.choice(pool)
+    lastname = rnd.choice(pool)[2]
+    fullname = ' '.join(part for part in (prefix, firstname, lastname) if part)
+    return fullname, firstname, lastname
 
-    for_fake_grades = []
 
-    for _ in range(NUMBER_GRADES):
-        for_fake_grades.append((randint(4, 12), randint(1, len(for_fake_students)), randint(1, len(for_fake_subjects)),
-                           fake_data.date_between_dates(datetime(2022, 1, 1), datetime(2022, 12, 31))))
-  
-    return for_fake_students,for_fake_groups, for_fake_subjects, for_fake_teachers, for_fake_grades
+def prepare_fake_data(students=NUMBER_STUDENTS, groups=NUMBER_GROUPS, subjects=NUMBER_SUBJECTS,
+                      teachers=NUMBER_TEACHERS, seed=None) -> tuple():
+    # everything except grades, these tables stay small
+    rnd = random.Random(seed)
+    if seed is not None:
+        fake_data.seed_instance(seed)
+    pool = name_pool(min(NAME_SAMPLE, max(students, teachers)))
 
-def insert_data_to_db(students, groups, subjects, teachers, grades) -> None:
-
-    with sqlite3.connect('university.db') as connect:
+    for_fake_groups = []
+    names = set()
+    while len(for_fake_groups) < groups:
+        name = fake_data.bothify(text='Group ?#') if groups <= 100 else f'Group {len(for_fake_groups) + 1}'
+        if name not in names:  # groups.name is UNIQUE
+            names.add(name)
+            for_fake_groups.append((name,))
+
+    for_fake_students = [(*make_person(rnd, pool), rnd.randint(1, groups)) for _ in range(students)]
+    for_fake_teachers = [make_person(rnd, pool) for _ in range(teachers)]
+
+    jobs = [fake_data.job() for _ in range(min(subjects, NAME_SAMPLE))]
+    for_fake_subjects = []
+    for i in range(subjects):
+        name = jobs[i] if i < len(jobs) else f'{jobs[i % len(jobs)]} {i // len(jobs) + 1}'
+        for_fake_subjects.append((name, rnd.randint(1, teachers)))
+
+    return for_fake_students, for_fake_groups, for_fake_subjects, for_fake_teachers
+
+
+def grades_chunk(args):
+    # one chunk of (grade, student_id, subject_id, date_of) rows; random.choices is far cheaper than randint per value
+    size, students, subjects, seed = args
+    rnd = random.Random(seed)
+    return list(zip(
+        rnd.choices(range(4, 13), k=size),
+        rnd.choices(range(1, students + 1), k=size),
+        rnd.choices(range(1, subjects + 1), k=size),
+        rnd.choices(DATES, k=size),
+    ))
+
+
+def iter_grades(count, students, subjects, chunk_size=CHUNK_SIZE, workers=1, seed=None):
+    # each chunk has its own seed, so the result does not depend on the number of workers
+    base = random.Random(seed).getrandbits(32)
+    tasks = ((min(chunk_size, count - start), students, subjects, base + start)
+             for start in range(0, count, chunk_size))
+    if workers <= 1:
+        yield from map(grades_chunk, tasks)
+        return
+    with Pool(workers) as pool:
+        yield from pool.imap(grades_chunk, tasks)
+
+
+def bulk_connect(database):
+    connect = sqlite3.connect(database)
+    connect.execute('PRAGMA journal_mode = OFF')  # a failed load is simply run again
+    connect.execute('PRAGMA synchronous = OFF')
+    connect.execute('PRAGMA locking_mode = EXCLUSIVE')
+    connect.execute('PRAGMA temp_store = MEMORY')
+    connect.execute('PRAGMA cache_size = -262144')
+    return connect
+
+
+def insert_data_to_db(students, groups, subjects, teachers, grades, database='university.db') -> None:
+    # grades is any iterable of row chunks; each chunk is committed on its own
+    connect = bulk_connect(database)
+    try:
         cur = connect.cursor()
 
         sql_to_students = """INSERT INTO students(fullname, firstname, lastname, group_id)
@@ -67,16 +122,43 @@ def insert_data_to_db(students, groups, subjects, teachers, grades) -> None:
                               VALUES (?, ?, ?)"""
         cur.executemany(sql_to_teachers, teachers)
 
+        connect.commit()
+
         sql_to_grades = """INSERT INTO grades(grade, student_id, subject_id, date_of)
                               VALUES (?, ?, ?, ?)"""
-        cur.executemany(sql_to_grades, grades)
+        for chunk in grades:
+            cur.executemany(sql_to_grades, chunk)
+            connect.commit()
+    finally:
+        connect.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill university.db with fake data')
+    parser.add_argument('--students', type=int, default=NUMBER_STUDENTS)
+    parser.add_argument('--groups', type=int, default=NUMBER_GROUPS)
+    parser.add_argument('--subjects', type=int, default=NUMBER_SUBJECTS)
+    parser.add_argument('--teachers', type=int, default=NUMBER_TEACHERS)
+    parser.add_argument('--grades', type=int, default=NUMBER_GRADES)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='grades per transaction')
+    parser.add_argument('--workers', type=int, default=1, help='processes generating grades')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--database', default='university.db')
+    parser.add_argument('--indexes', action='store_true', help='run upgrade_db.py after loading')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    create_db(args.database)
+    students, groups, subjects, teachers = prepare_fake_data(
+        args.students, args.groups, args.subjects, args.teachers, args.seed)
+    grades = iter_grades(args.grades, args.students, args.subjects, args.chunk_size, args.workers, args.seed)
+    insert_data_to_db(students, groups, subjects, teachers, grades, args.database)
+    print(f'Loaded {args.grades} grades in {perf_counter() - start:.1f}s')
+    if args.indexes:
+        from upgrade_db import upgrade_db
+        upgrade_db(args.database)
+        print(f'Indexes built, total {perf_counter() - start:.1f}s')
 
-        connect.commit()
-    
-if __name__ == "__main__":
-    create_db()
-    students, groups, subjects, teachers, grades = prepare_fake_data()
-    insert_data_to_db(students, groups, subjects, teachers, grades)
-
- 
 
+if __name__ == "__main__":
+    main()
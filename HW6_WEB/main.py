@@ -1,3 +1,5 @@
+import pathlib
+import re
 import sqlite3
 import sys
 
@@ -17,27 +19,78 @@ help_for_user = """Choose which request you want to perform?
 12 -- Grades of students in a certain group on a certain subject in the last session.
 """
 
-def execute_query(file):
-    with open(file) as f:
-        sql = f.read()
+class QueryRegistry:
+    # all query_N.sql files are read once; the statements are run with parameters
+    # on one connection, sqlite3 keeps them prepared in its statement cache.
+    # With a variant, query_N_<variant>.sql is used where it exists (e.g. 'stats'
+    # reads the summary tables from create_aggregates.sql)
 
-    with sqlite3.connect('university.db') as con:
-        cursor = con.cursor()
-        cursor.execute(sql)
-        return cursor.fetchall()
-    
-def main():
+    def __init__(self, database='university.db', directory=pathlib.Path(__file__).parent, count=12, variant=None):
+        self.queries = {}
+        for number in range(1, count + 1):
+            path = pathlib.Path(directory) / f'query_{number}.sql'
+            if variant and path.with_name(f'query_{number}_{variant}.sql').exists():
+                path = path.with_name(f'query_{number}_{variant}.sql')
+            with open(path) as f:
+                sql = f.read()
+            defaults = {}
+            params = re.search(r'^-- params:(.*)$', sql, re.MULTILINE)
+            if params:
+                for pair in params.group(1).split(','):
+                    name, value = pair.strip().split('=')
+                    defaults[name] = int(value)
+            self.queries[number] = (sql, defaults)
+        self.connection = sqlite3.connect(database, check_same_thread=False, cached_statements=count * 2)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('PRAGMA cache_size = -64000')
+        self.connection.execute('PRAGMA temp_store = MEMORY')
+        self.connection.execute('PRAGMA mmap_size = 268435456')
+
+    def params(self, number):
+        return dict(self.queries[number][1])
+
+    def execute(self, number, **params):
+        sql, defaults = self.queries[number]
+        return self.connection.execute(sql, {**defaults, **params}).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+def execute_query(file, **params):
+    number = int(re.search(r'query_(\d+)\.sql$', str(file)).group(1))
+    return get_registry().execute(number, **params)
+
+registry = None
+
+def get_registry(variant=None):
+    global registry
+    if registry is None:
+        registry = QueryRegistry(variant=variant)
+    return registry
+
+def main(variant=None):
     print(help_for_user)
+    queries = get_registry(variant)
    
     while True:
         number = int(input("Choose the request number: "))
         if number == 0:
             sys.exit()
-        result = execute_query(f'query_{number}.sql')
+        if number not in queries.queries:
+            print(help_for_user)
+            continue
+        params = queries.params(number)
+        for name, default in params.items():
+            value = input(f"{name} [{default}]: ").strip()
+            if value:
+                params[name] = int(value)
+        result = queries.execute(number, **params)
         print(result)
 
 if __name__ == '__main__':
     try:
-        exit(main())
+        exit(main(sys.argv[1] if len(sys.argv) > 1 else None))  # python main.py stats
     except KeyboardInterrupt:
         exit()
\ No newline at end of file
@@ -1,8 +1,9 @@
 -- A list of courses taught to a particular student by a particular teacher.
+-- params: student_id=1, teacher_id=2
 SELECT students.fullname,subjects.name, teachers.fullname
 FROM grades
 LEFT JOIN students ON students.id = grades.student_id
 LEFT JOIN subjects ON subjects.id = grades.subject_id
-LEFT JOIN teachers ON teachers.id = grades.subject_id
-WHERE grades.student_id = 1 AND teachers.id = 2
+LEFT JOIN teachers ON teachers.id = subjects.teacher_id
+WHERE grades.student_id = :student_id AND teachers.id = :teacher_id
 GROUP BY subjects.id, students.fullname, teachers.fullname ;
\ No newline at end of file
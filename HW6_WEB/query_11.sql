@@ -1,8 +1,9 @@
 -- The average score given by a particular teacher to a particular student.
+-- params: student_id=1, teacher_id=2
 SELECT students.fullname, teachers.fullname, round(avg(grades.grade), 2) AS avg_grade
 FROM grades
 LEFT JOIN students ON students.id = grades.student_id
 LEFT JOIN subjects ON subjects.id = grades.subject_id
 LEFT JOIN teachers ON teachers.id = subjects.teacher_id
-WHERE grades.student_id = 1 AND teachers.id = 2
+WHERE grades.student_id = :student_id AND teachers.id = :teacher_id
 GROUP BY students.fullname, teachers.fullname;
\ No newline at end of file
@@ -0,0 +1,10 @@
+-- The average score given by a particular teacher to a particular student (from student_subject_stats).
+-- params: student_id=1, teacher_id=2
+SELECT students.fullname, teachers.fullname,
+       round(SUM(student_subject_stats.grade_sum) * 1.0 / SUM(student_subject_stats.grade_count), 2) AS avg_grade
+FROM student_subject_stats
+JOIN subjects ON subjects.id = student_subject_stats.subject_id
+JOIN students ON students.id = student_subject_stats.student_id
+JOIN teachers ON teachers.id = subjects.teacher_id
+WHERE student_subject_stats.student_id = :student_id AND subjects.teacher_id = :teacher_id
+GROUP BY students.fullname, teachers.fullname;
@@ -0,0 +1,5 @@
+-- Find the 5 students with the highest GPA across all subjects (from student_stats).
+SELECT students.fullname, ROUND(student_stats.grade_sum * 1.0 / student_stats.grade_count, 2) AS avg_grade
+FROM student_stats
+JOIN students ON students.id = student_stats.student_id
+ORDER BY student_stats.grade_sum * 1.0 / student_stats.grade_count DESC LIMIT 5;
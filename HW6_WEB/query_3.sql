@@ -1,9 +1,10 @@
 -- Find the average score in groups for a certain subject.
+-- params: subject_id=2
 SELECT subjects.name, groups.name, round(avg(grades.grade), 2) AS grade
 FROM grades
 LEFT JOIN students ON students.id = grades.student_id
 LEFT JOIN subjects ON subjects.id = grades.subject_id
 LEFT JOIN groups ON groups.id = students.group_id
-WHERE subjects.id = 2
+WHERE subjects.id = :subject_id
 GROUP BY groups.id
 ORDER BY grade DESC;
\ No newline at end of file
@@ -0,0 +1,8 @@
+-- Find the average score in groups for a certain subject (from group_subject_stats).
+-- params: subject_id=2
+SELECT subjects.name, groups.name, round(group_subject_stats.grade_sum * 1.0 / group_subject_stats.grade_count, 2) AS grade
+FROM group_subject_stats
+JOIN subjects ON subjects.id = group_subject_stats.subject_id
+JOIN groups ON groups.id = group_subject_stats.group_id
+WHERE group_subject_stats.subject_id = :subject_id
+ORDER BY grade DESC;
@@ -0,0 +1,3 @@
+-- Find the average score on the stream (from subject_stats).
+SELECT round(SUM(grade_sum) * 1.0 / SUM(grade_count), 2) AS avg_grade
+FROM subject_stats;
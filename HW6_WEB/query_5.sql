@@ -1,5 +1,6 @@
 -- Find what courses a particular teacher teaches.
+-- params: teacher_id=2
 SELECT teachers.fullname, subjects.name
 FROM teachers
 LEFT JOIN subjects ON subjects.teacher_id = teachers.id
-WHERE teachers.id = 2;
\ No newline at end of file
+WHERE teachers.id = :teacher_id;
\ No newline at end of file
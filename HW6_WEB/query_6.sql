@@ -1,5 +1,6 @@
 -- Find the list of students in a particular group.
+-- params: group_id=1
 SELECT students.id, students.fullname, groups.name
 FROM students
 LEFT JOIN groups ON groups.id = students.group_id
-WHERE groups.id = 1;
\ No newline at end of file
+WHERE groups.id = :group_id;
\ No newline at end of file
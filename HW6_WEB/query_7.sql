@@ -1,7 +1,8 @@
 -- Find the grades of students in a separate group for a particular subject.
+-- params: subject_id=2, group_id=1
 SELECT subjects.name, groups.name, students.fullname, grades.date_of, grades.grade
 FROM grades
 LEFT JOIN students ON students.id = grades.student_id
 LEFT JOIN subjects ON subjects.id = grades.subject_id
 LEFT JOIN groups ON groups.id = students.group_id
-WHERE subjects.id = 2 AND groups.id = 1;
\ No newline at end of file
+WHERE subjects.id = :subject_id AND groups.id = :group_id;
\ No newline at end of file
@@ -1,7 +1,8 @@
 -- Find the average score given by a certain teacher in his subjects.
+-- params: teacher_id=3
 SELECT teachers.fullname, round(avg(grades.grade), 2) AS avg_grade
 FROM grades
-LEFT JOIN subjects ON subjects.id = grades.subject_id
-LEFT JOIN teachers ON teachers.id = subjects.teacher_id
-WHERE teachers.id = 3
+JOIN subjects ON subjects.id = grades.subject_id
+JOIN teachers ON teachers.id = subjects.teacher_id
+WHERE teachers.id = :teacher_id
 GROUP BY teachers.fullname;
\ No newline at end of file
@@ -0,0 +1,6 @@
+-- Find the average score given by a certain teacher in his subjects (from teacher_stats).
+-- params: teacher_id=3
+SELECT teachers.fullname, round(teacher_stats.grade_sum * 1.0 / teacher_stats.grade_count, 2) AS avg_grade
+FROM teacher_stats
+JOIN teachers ON teachers.id = teacher_stats.teacher_id
+WHERE teacher_stats.teacher_id = :teacher_id;
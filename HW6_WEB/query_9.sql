@@ -1,7 +1,8 @@
 -- Find a list of courses that the student is taking.
+-- params: student_id=1
 SELECT students.fullname, subjects.name
 FROM grades
 LEFT JOIN students ON students.id = grades.student_id
 LEFT JOIN subjects ON subjects.id = grades.subject_id
-WHERE grades.student_id = 1
+WHERE grades.student_id = :student_id
 GROUP BY subjects.name;
\ No newline at end of file
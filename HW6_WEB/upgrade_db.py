@@ -0,0 +1,25 @@
+import argparse
+import pathlib
+import sqlite3
+
+def upgrade_db(database='university.db', aggregates=False):
+    # indexes for the report queries, WAL journal and fresh planner statistics;
+    # aggregates adds the trigger-maintained summary tables read by query_N_stats.sql
+    scripts = ['create_indexes.sql'] + (['create_aggregates.sql'] if aggregates else [])
+
+    connect = sqlite3.connect(database)
+    try:
+        connect.execute('PRAGMA journal_mode = WAL')  # stored in the database file, synchronous/cache_size are set per connection in main.py
+        for script in scripts:
+            with open(pathlib.Path(__file__).parent / script, 'r') as fl:
+                connect.executescript(fl.read())
+        connect.execute('ANALYZE')
+    finally:
+        connect.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add indexes (and summary tables) to university.db')
+    parser.add_argument('--database', default='university.db')
+    parser.add_argument('--aggregates', action='store_true', help='also create the summary tables and triggers')
+    args = parser.parse_args()
+    upgrade_db(args.database, args.aggregates)
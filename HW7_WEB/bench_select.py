@@ -0,0 +1,165 @@
+import argparse
+import csv
+import inspect
+import json
+import os
+import random
+import statistics
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+
+SCALES = [1000, 100000]
+DATES = [d for d in (date(2022, 9, 1) + timedelta(days=i) for i in range(273)) if d.isoweekday() < 6]  # as in seed.py
+CHUNK_SIZE = 50_000
+
+
+def scale_sizes(grades):
+    # table sizes for a number of grades, the same proportions as HW6_WEB/bench_queries.py
+    students = max(30, grades // 100)
+    groups = max(3, students // 30)
+    disciplines = min(50, max(7, students // 100))
+    teachers = max(5, disciplines // 3)
+    return {'grades': grades, 'students': students, 'groups': groups, 'disciplines': disciplines, 'teachers': teachers}
+
+
+def seed(sizes, seed_value=0):
+    # recreates all tables of database/models.py and bulk-inserts synthetic rows
+    rnd = random.Random(seed_value)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session.execute(insert(Teacher), [{'fullname': f'Teacher {i}'} for i in range(1, sizes['teachers'] + 1)])
+    session.execute(insert(Group), [{'name': f'G{i}'} for i in range(1, sizes['groups'] + 1)])
+    session.execute(insert(Discipline), [{'name': f'Discipline {i}', 'teacher_id': rnd.randint(1, sizes['teachers'])}
+                                         for i in range(1, sizes['disciplines'] + 1)])
+    session.execute(insert(Student), [{'fullname': f'Student {i}', 'group_id': rnd.randint(1, sizes['groups'])}
+                                      for i in range(1, sizes['students'] + 1)])
+    session.commit()
+    for start in range(0, sizes['grades'], CHUNK_SIZE):
+        size = min(CHUNK_SIZE, sizes['grades'] - start)
+        session.execute(insert(Grade), [
+            {'grade': grade, 'date_of': date_of, 'student_id': student_id, 'discipline_id': discipline_id}
+            for grade, date_of, student_id, discipline_id in zip(
+                rnd.choices(range(1, 13), k=size), rnd.choices(DATES, k=size),
+                rnd.choices(range(1, sizes['students'] + 1), k=size),
+                rnd.choices(range(1, sizes['disciplines'] + 1), k=size))
+        ])
+        session.commit()
+
+
+def existing_ids():
+    return {
+        'student_id': session.scalars(select(Student.id)).all(),
+        'group_id': session.scalars(select(Group.id)).all(),
+        'discipline_id': session.scalars(select(Discipline.id)).all(),
+        'teacher_id': session.scalars(select(Teacher.id)).all(),
+    }
+
+
+def query_plan(func, params):
+    # runs func once while recording the SQL it sends, then asks the database to explain that statement
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        func(**params)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    statement, parameters = statements[-1]
+    if engine.dialect.name == 'sqlite':
+        rows = session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        return '; '.join(str(row[-1]) for row in rows)
+    rows = session.connection().exec_driver_sql('EXPLAIN ' + statement, parameters).all()
+    return '; '.join(' '.join(str(value) for value in row if value is not None) for row in rows)
+
+
+def percentiles(timings):
+    q = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return {'p50_ms': round(q[49] * 1000, 3), 'p95_ms': round(q[94] * 1000, 3),
+            'p99_ms': round(q[98] * 1000, 3), 'max_ms': round(max(timings) * 1000, 3)}
+
+
+def measure(scale, samples, seed_value=0):
+    ids = existing_ids()
+    rows = []
+    for number in range(1, 13):
+        func = getattr(my_select, f'select_{number}')
+        names = list(inspect.signature(func).parameters)
+        rnd = random.Random(seed_value + number)
+        params = [{name: rnd.choice(ids[name]) for name in names} for _ in range(samples)]
+        plan = query_plan(func, params[0])  # also warms the cache
+        timings = []
+        for values in params:
+            start = perf_counter()
+            func(**values)
+            timings.append(perf_counter() - start)
+        session.rollback()  # ends the read transaction, as a new request would
+        rows.append({'dialect': engine.dialect.name, 'scale': scale, 'query': number, 'samples': samples,
+                     **percentiles(timings), 'plan': plan})
+        print("| {dialect:<10} | {scale:>9} | q{query:<3} | {p50_ms:>10.3f} | {p95_ms:>10.3f} | {p99_ms:>10.3f} |".format(**rows[-1]))
+    return rows
+
+
+def run(scales, samples, seed_data, seed_value=0):
+    rows = []
+    if not seed_data:
+        scale = session.scalar(select(func.count(Grade.id)))
+        return measure(scale, samples, seed_value)
+    for grades in scales:
+        sizes = scale_sizes(grades)
+        start = perf_counter()
+        seed(sizes, seed_value)
+        print(f"seeded {sizes} in {perf_counter() - start:.1f}s")
+        rows.extend(measure(grades, samples, seed_value))
+    return rows
+
+
+def save(rows, path):
+    if path.endswith(".json"):
+        with open(path, "w", encoding="utf-8") as fd:
+            json.dump(rows, fd, indent=4)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as fd:
+            writer = csv.DictWriter(fd, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of select_1 ... select_12 at several data scales")
+    parser.add_argument("--url", help="database URL, default DATABASE_URL or a temporary sqlite file")
+    parser.add_argument("--seed-data", action="store_true",
+                        help="drop and seed the tables at --url for every scale (always done for the temporary sqlite file)")
+    parser.add_argument("--scales", nargs="+", type=int, default=SCALES, help="grades, e.g. 1000 100000 10000000")
+    parser.add_argument("--samples", type=int, default=20, help="parameter sets per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="select_benchmark.csv", help="results file, .csv or .json")
+    args = parser.parse_args()
+
+    url = args.url or os.environ.get('DATABASE_URL')
+    tmp = None
+    if url is None:
+        tmp = tempfile.mkdtemp()
+        url = f"sqlite:///{os.path.join(tmp, 'university.db')}"
+        args.seed_data = True
+    os.environ['DATABASE_URL'] = url  # read when database.connect_db is imported
+
+    from sqlalchemy import event, func, insert, select
+
+    import my_select
+    from database.connect_db import engine, session
+    from database.models import Base, Discipline, Grade, Group, Student, Teacher
+
+    try:
+        rows = run(args.scales, args.samples, args.seed_data, args.seed)
+    finally:
+        session.close()
+        engine.dispose()
+        if tmp is not None:
+            os.remove(os.path.join(tmp, 'university.db'))
+            os.rmdir(tmp)
+    save(rows, args.out)
+    print(f"Results saved to {args.out}")